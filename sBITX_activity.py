@@ -0,0 +1,89 @@
+"""
+Rolling decode counts per memory and per band.
+
+Each series is a fixed ring of time buckets held in two arrays, the count and the
+bucket number it belongs to. Recording is O(1): a slot still holding an older bucket
+is reset when it is reused, so nothing has to be aged out in the background.
+"""
+
+import threading
+import time
+from array import array
+
+
+class ActivitySeries:
+    __slots__ = ('counts', 'stamps')
+
+    def __init__(self, buckets):
+        self.counts = array('I', [0]) * buckets
+        self.stamps = array('q', [-1]) * buckets
+
+
+class ActivityModel:
+    def __init__(self, bucket_seconds=60, buckets=60):
+        self.bucket_seconds = bucket_seconds
+        self.buckets = buckets
+        self.series = {}
+        self.lock = threading.Lock()
+
+    def bucket(self, now=None):
+        return int((now if now is not None else time.time()) // self.bucket_seconds)
+
+    def _add(self, key, bucket, count):
+        series = self.series.get(key)
+        if series is None:
+            series = self.series[key] = ActivitySeries(self.buckets)
+        slot = bucket % self.buckets
+        if series.stamps[slot] != bucket:
+            series.stamps[slot] = bucket
+            series.counts[slot] = 0
+        series.counts[slot] += count
+
+    def record(self, memory_id, band, count=1, now=None):
+        # Decodes heard while tuned to memory_id, on band
+        if count <= 0:
+            return
+        bucket = self.bucket(now)
+        with self.lock:
+            if memory_id is not None:
+                self._add(('memory', memory_id), bucket, count)
+            if band:
+                self._add(('band', band), bucket, count)
+
+    def recent(self, key, seconds, now=None):
+        # Decodes in the buckets covering the last seconds, the current bucket included
+        current = self.bucket(now)
+        first = current - min(self.buckets, max(1, -(-int(seconds) // self.bucket_seconds))) + 1
+        with self.lock:
+            series = self.series.get(key)
+            if series is None:
+                return 0
+            total = 0
+            for bucket in range(first, current + 1):
+                slot = bucket % self.buckets
+                if series.stamps[slot] == bucket:
+                    total += series.counts[slot]
+            return total
+
+    def memory_count(self, memory_id, seconds, now=None):
+        return self.recent(('memory', memory_id), seconds, now)
+
+    def band_count(self, band, seconds, now=None):
+        return self.recent(('band', band), seconds, now)
+
+    def history(self, key, now=None):
+        # Counts per bucket, oldest first, ending with the current bucket
+        current = self.bucket(now)
+        with self.lock:
+            series = self.series.get(key)
+            if series is None:
+                return [0] * self.buckets
+            counts = []
+            for bucket in range(current - self.buckets + 1, current + 1):
+                slot = bucket % self.buckets
+                counts.append(series.counts[slot] if series.stamps[slot] == bucket else 0)
+            return counts
+
+    def forget(self, memory_id):
+        with self.lock:
+            self.series.pop(('memory', memory_id), None)
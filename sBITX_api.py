@@ -0,0 +1,299 @@
+"""
+Local control API, so several clients can share the one telnet link to the sBITX.
+
+Clients connect to a localhost TCP port (or a Unix socket) and exchange JSON
+objects, one per line:
+
+    {"id": 1, "op": "recall", "memory": "14074"}
+    {"id": 1, "ok": true, "result": {"sBITX": [["f 14074", true, "..."], ...]}}
+
+Ops are ping, state, memories, recall (memory, optional radio), send (command,
+optional radio), subscribe and unsubscribe. Subscribers receive every decode
+as {"type": "decode", ...} lines.
+
+Radio commands from all clients go through one scheduler that takes a request
+from each waiting client in turn, so a script queueing a long batch cannot
+starve a second screen. A state request waits its turn too, so it reflects the
+recalls the same client sent before it. Decodes are encoded once per batch and the same bytes
+are written to every subscriber. A subscriber that stops reading has lines
+dropped (counted in ping) instead of holding up the others.
+
+There is no authentication: anyone who can reach the port can send any command
+to the radio, including ones that key the transmitter. The TCP server only
+listens on localhost and a Unix socket is only open to its owner.
+
+The server runs on its own event-loop thread. handler(op, request) is called on
+that thread and returns a concurrent.futures.Future for the JSON result.
+"""
+
+import asyncio
+import json
+import os
+import sys
+import threading
+from collections import deque
+from concurrent.futures import Future
+
+DEFAULT_PORT = 8765
+
+# Ops that talk to the radio and take their turn in the scheduler
+RADIO_OPS = {"recall", "send"}
+# Ops that also wait behind the client's earlier radio ops
+ORDERED_OPS = RADIO_OPS | {"state"}
+# Ops answered as soon as they arrive
+QUERY_OPS = {"ping", "memories", "subscribe", "unsubscribe"}
+
+
+class RequestError(Exception):
+    # A request that can not be carried out, sent back to the client as its error
+    pass
+
+
+def encode(item):
+    return json.dumps(item, separators=(",", ":")).encode() + b"\n"
+
+
+def batch_result(futures):
+    # {name: future} from RadioPool.fan_out to {name: [[command, ok, reply], ...] or reply}
+    result = {}
+    for name, future in futures.items():
+        if future.cancelled():
+            result[name] = {"error": "replaced by a newer recall"}
+        elif future.exception() is not None:
+            result[name] = {"error": str(future.exception())}
+        else:
+            value = future.result()
+            result[name] = [list(item) for item in value] if isinstance(value, list) else value
+    return result
+
+
+def fan_out_result(fanned, future=None):
+    # A future for the JSON form of a RadioPool.fan_out future
+    future = future or Future()
+
+    def done(fanned):
+        try:
+            future.set_result(batch_result(fanned.result()))
+        except Exception as e:
+            future.set_exception(e)
+
+    fanned.add_done_callback(done)
+    return future
+
+
+def radio_status(radio, memory_bank):
+    memory = memory_bank.get(radio.current_memory_id)
+    return {
+        "connected": radio.link_up,
+        "status": radio.connection.status if radio.connection else "Not connected",
+        "host": radio.host,
+        "port": radio.port,
+        "memory": {key: memory[key] for key in ("id", "text", "mode") if key in memory} if memory else None,
+        "state": radio.state.snapshot(),
+        "pending": radio.executor.pending(),
+    }
+
+
+class Client:
+    __slots__ = ("writer", "pending")
+
+    def __init__(self, writer):
+        self.writer = writer
+        self.pending = deque()
+
+
+class ControlServer:
+    def __init__(self, handler, host="127.0.0.1", port=DEFAULT_PORT, path=None,
+                 max_pending=32, max_buffer=1 << 20, timeout=30.0):
+        self.handler = handler
+        self.host = host
+        self.port = port
+        # A Unix socket path instead of the TCP port
+        self.path = path
+        self.max_pending = max_pending
+        self.max_buffer = max_buffer
+        self.timeout = timeout
+
+        self.clients = set()
+        self.subscribers = set()
+        self.ready = deque()
+        self.dropped = 0
+
+        self.loop = None
+        self.loop_thread = None
+        self.server = None
+        self.work = None
+        self.scheduler_task = None
+
+    @property
+    def running(self):
+        return self.loop is not None
+
+    def start(self):
+        # Returns a future for the bound port, or the socket path
+        if self.loop is None:
+            self.loop = asyncio.new_event_loop()
+            self.loop_thread = threading.Thread(target=self.loop.run_forever, name="sbitx-api", daemon=True)
+            self.loop_thread.start()
+        return asyncio.run_coroutine_threadsafe(self._start(), self.loop)
+
+    def stop(self):
+        if self.loop is None:
+            return
+        try:
+            asyncio.run_coroutine_threadsafe(self._stop(), self.loop).result(timeout=5)
+        except Exception as e:
+            print(f"Error stopping the control API: {e}", file=sys.stderr)
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self.loop_thread.join(timeout=5)
+        self.loop.close()
+        self.loop = None
+
+    def publish(self, radio_name, records):
+        # Any thread. Each record is encoded once, whatever the number of subscribers
+        if not self.subscribers or not records or self.loop is None:
+            return
+        lines = []
+        for record in records:
+            item = record.as_dict()
+            item["type"] = "decode"
+            item["radio"] = radio_name
+            lines.append(encode(item))
+        self.loop.call_soon_threadsafe(self._broadcast, b"".join(lines), len(lines))
+
+    async def _start(self):
+        if self.server is None:
+            self.work = asyncio.Event()
+            self.scheduler_task = asyncio.ensure_future(self._schedule())
+            if self.path:
+                if os.path.exists(self.path):
+                    os.unlink(self.path)
+                self.server = await asyncio.start_unix_server(self._serve, self.path)
+                # Requests are not authenticated, keep other users off the radio
+                os.chmod(self.path, 0o600)
+            else:
+                self.server = await asyncio.start_server(self._serve, self.host, self.port)
+        if self.path:
+            return self.path
+        return self.server.sockets[0].getsockname()[1]
+
+    async def _stop(self):
+        if self.scheduler_task:
+            self.scheduler_task.cancel()
+            self.scheduler_task = None
+        if self.server:
+            self.server.close()
+            await self.server.wait_closed()
+            self.server = None
+        for client in list(self.clients):
+            client.writer.close()
+        self.clients.clear()
+        self.subscribers.clear()
+        self.ready.clear()
+        if self.path and os.path.exists(self.path):
+            os.unlink(self.path)
+
+    def _broadcast(self, data, lines):
+        for client in self.subscribers:
+            transport = client.writer.transport
+            if transport.is_closing():
+                continue
+            if transport.get_write_buffer_size() > self.max_buffer:
+                # Not reading, skip it rather than buffer without limit
+                self.dropped += lines
+                continue
+            client.writer.write(data)
+
+    async def _serve(self, reader, writer):
+        client = Client(writer)
+        self.clients.add(client)
+        try:
+            while True:
+                try:
+                    line = await reader.readline()
+                except (ValueError, asyncio.LimitOverrunError):
+                    self._reply(client, None, error="request too long")
+                    break
+                except OSError:
+                    break
+                if not line:
+                    break
+                if line.strip():
+                    self._accept(client, line)
+        finally:
+            self.clients.discard(client)
+            self.subscribers.discard(client)
+            client.pending.clear()
+            writer.close()
+
+    def _accept(self, client, line):
+        try:
+            request = json.loads(line)
+            if not isinstance(request, dict):
+                raise ValueError("not an object")
+        except ValueError as e:
+            self._reply(client, None, error=f"bad request: {e}")
+            return
+        request_id = request.get("id")
+        op = request.get("op")
+
+        if op == "subscribe":
+            self.subscribers.add(client)
+            self._reply(client, request_id, result=True)
+        elif op == "unsubscribe":
+            self.subscribers.discard(client)
+            self._reply(client, request_id, result=True)
+        elif op == "ping":
+            self._reply(client, request_id, result={"clients": len(self.clients), "subscribers": len(self.subscribers),
+                                                    "dropped": self.dropped})
+        elif op in QUERY_OPS:
+            asyncio.ensure_future(self._run(client, request))
+        elif op in ORDERED_OPS:
+            if len(client.pending) >= self.max_pending:
+                self._reply(client, request_id, error="too many requests waiting")
+                return
+            if not client.pending:
+                self.ready.append(client)
+            client.pending.append(request)
+            self.work.set()
+        else:
+            self._reply(client, request_id, error=f"unknown op '{op}'")
+
+    async def _schedule(self):
+        # One radio request at a time, round-robin over the clients that have one waiting
+        while True:
+            if not self.ready:
+                self.work.clear()
+                await self.work.wait()
+                continue
+            client = self.ready.popleft()
+            if client not in self.clients or not client.pending:
+                continue
+            request = client.pending.popleft()
+            if client.pending:
+                self.ready.append(client)
+            await self._run(client, request)
+
+    async def _run(self, client, request):
+        request_id = request.get("id")
+        try:
+            future = self.handler(request["op"], request)
+            result = await asyncio.wait_for(asyncio.wrap_future(future), self.timeout)
+        except asyncio.TimeoutError:
+            self._reply(client, request_id, error="timed out")
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            self._reply(client, request_id, error=str(e) or type(e).__name__)
+        else:
+            self._reply(client, request_id, result=result)
+
+    def _reply(self, client, request_id, result=None, error=None):
+        if client.writer.transport.is_closing():
+            return
+        try:
+            data = encode({"id": request_id, "ok": True, "result": result} if error is None else
+                          {"id": request_id, "ok": False, "error": error})
+        except (TypeError, ValueError) as e:
+            data = encode({"id": request_id, "ok": False, "error": f"bad result: {e}"})
+        client.writer.write(data)
@@ -0,0 +1,46 @@
+"""
+Amateur band plan and frequency helpers shared by the sBITX Manager modules.
+"""
+
+import math
+from bisect import bisect_right
+
+# Band name and edges in Hz, sorted by lower edge
+BANDS = [
+    ("160m", 1800000, 2000000),
+    ("80m", 3500000, 4000000),
+    ("60m", 5250000, 5450000),
+    ("40m", 7000000, 7300000),
+    ("30m", 10100000, 10150000),
+    ("20m", 14000000, 14350000),
+    ("17m", 18068000, 18168000),
+    ("15m", 21000000, 21450000),
+    ("12m", 24890000, 24990000),
+    ("10m", 28000000, 29700000),
+]
+
+BAND_NAMES = [band[0] for band in BANDS]
+_BAND_STARTS = [band[1] for band in BANDS]
+
+
+def frequency_hz(text):
+    # The sBITX accepts frequencies in kHz ("7074") or Hz ("7030000")
+    try:
+        value = float(str(text).strip())
+    except ValueError:
+        return None
+    if not math.isfinite(value) or value <= 0:
+        return None
+    if value < 100000:
+        value *= 1000
+    return int(round(value))
+
+
+def band_for_frequency(frequency):
+    hz = frequency if isinstance(frequency, int) else frequency_hz(frequency)
+    if hz is None:
+        return None
+    index = bisect_right(_BAND_STARTS, hz) - 1
+    if index >= 0 and hz <= BANDS[index][2]:
+        return BANDS[index][0]
+    return None
@@ -0,0 +1,184 @@
+#!/usr/bin/env python3
+
+"""
+Latency and throughput benchmarks for the sBITX Manager command and decode paths.
+
+Runs headless against the local simulator (or a real radio with --host) and
+drives the same pieces TelnetGUI uses: RadioConnection, the Radio.recall path
+(RadioState planning on the CommandExecutor worker), ScanScheduler and the
+StreamDemux / DecodeParser / DecodeIndex ingest pipeline.
+
+Example:
+    ./sBITX_benchmark.py --delay 5 --jitter 2 --json results.json
+    ./sBITX_benchmark.py --delay 5 --jitter 2 --baseline results.json
+"""
+
+import argparse
+import json
+import random
+import sys
+import time
+
+from sBITX_connection import RadioConnection, StreamDemux
+from sBITX_decode import DecodeIndex, DecodeParser
+from sBITX_radios import Radio
+from sBITX_scan import ScanScheduler
+from sBITX_simulator import SimulatedRadio, ft8_line, start_in_thread
+
+FT8_FREQUENCIES = ["1840", "3573", "5357", "7074", "10136", "14074", "18100", "21074", "24915", "28074"]
+
+# Higher is better for these, lower is better for everything else
+THROUGHPUT_METRICS = ("scan_steps_per_second", "ingest_lines_per_second")
+
+
+def percentile(samples, fraction):
+    ordered = sorted(samples)
+    if not ordered:
+        return 0.0
+    index = min(len(ordered) - 1, max(0, int(round(fraction * len(ordered) + 0.5)) - 1))
+    return ordered[index]
+
+
+def ft8_bank(count):
+    return [{'id': index + 1, 'text': FT8_FREQUENCIES[index % len(FT8_FREQUENCIES)], 'mode': 'FT8',
+             'bandwidth': '4000', 'if_setting': '55', 'agc_setting': 'Off'} for index in range(count)]
+
+
+def bench_radio(connection):
+    # A fresh Radio on the shared connection, so every run starts from an unknown radio state
+    radio = Radio({"name": "benchmark", "host": connection.host, "port": connection.port})
+    radio.connection = connection
+    return radio
+
+
+def bench_recall(connection, bank, count, pipelined, full):
+    radio = bench_radio(connection)
+    samples = []
+    failures = 0
+    try:
+        for index in range(count):
+            start = time.perf_counter()
+            results = radio.recall(bank[index % len(bank)], full, pipelined).result()
+            samples.append((time.perf_counter() - start) * 1000)
+            failures += sum(1 for _, ok, _ in results if not ok)
+    finally:
+        radio.executor.stop()
+    return {'p50_ms': percentile(samples, 0.50), 'p95_ms': percentile(samples, 0.95),
+            'p99_ms': percentile(samples, 0.99), 'max_ms': max(samples), 'failures': failures}
+
+
+def bench_scan(connection, bank, seconds):
+    radio = bench_radio(connection)
+    steps = []
+
+    def step(memory):
+        # Wait for the radio here, with no dwell the scheduler itself would not
+        radio.recall(memory, False, True).result()
+        steps.append(memory['id'])
+
+    scanner = ScanScheduler(step, default_dwell=0)
+    scanner.start(lambda: bank)
+    time.sleep(seconds)
+    scanner.stop()
+    radio.executor.stop()
+    return len(steps) / seconds
+
+
+def bench_ingest(lines, seed):
+    rng = random.Random(seed)
+    stream = "".join(ft8_line(rng) for _ in range(lines)).encode('ascii')
+
+    demux = StreamDemux()
+    parser = DecodeParser(band='20m', frequency=14074000)
+    index = DecodeIndex()
+    start = time.perf_counter()
+    for offset in range(0, len(stream), 4096):
+        _, decoded = demux.feed(stream[offset:offset + 4096], 0)
+        for line in decoded:
+            index.extend(parser.feed(line.decode('ascii', 'replace')))
+    elapsed = time.perf_counter() - start
+    if len(index) != lines:
+        print(f"Warning: parsed {len(index)} of {lines} decode lines", file=sys.stderr)
+    return lines / elapsed
+
+
+def compare(results, baseline, tolerance):
+    regressions = []
+    for name, value in flatten(results).items():
+        reference = flatten(baseline).get(name)
+        if not reference or name.endswith('failures'):
+            continue
+        if name.split('.')[-1] in THROUGHPUT_METRICS:
+            worse = value < reference * (1 - tolerance)
+        else:
+            worse = value > reference * (1 + tolerance)
+        if worse:
+            regressions.append(f"{name}: {value:.2f} vs baseline {reference:.2f}")
+    return regressions
+
+
+def flatten(results, prefix=""):
+    flat = {}
+    for name, value in results.items():
+        if isinstance(value, dict):
+            flat.update(flatten(value, f"{prefix}{name}."))
+        else:
+            flat[f"{prefix}{name}"] = value
+    return flat
+
+
+def main():
+    parser = argparse.ArgumentParser(description="sBITX Manager benchmarks")
+    parser.add_argument("--host", help="benchmark a real radio instead of the built-in simulator")
+    parser.add_argument("--port", type=int, default=8081)
+    parser.add_argument("--delay", type=float, default=2.0, help="simulated reply delay per command in ms")
+    parser.add_argument("--jitter", type=float, default=1.0, help="simulated jitter in ms")
+    parser.add_argument("--recalls", type=int, default=200)
+    parser.add_argument("--memories", type=int, default=100)
+    parser.add_argument("--scan-seconds", type=float, default=3.0)
+    parser.add_argument("--ingest-lines", type=int, default=50000)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--json", help="write results to this file")
+    parser.add_argument("--baseline", help="fail if results are worse than this earlier --json output")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="allowed regression, 0.2 is 20%%")
+    args = parser.parse_args()
+
+    host, port = args.host, args.port
+    if host is None:
+        radio = SimulatedRadio(delay=args.delay / 1000, jitter=args.jitter / 1000, seed=args.seed)
+        port, _ = start_in_thread(radio)
+        host = "127.0.0.1"
+
+    connection = RadioConnection(host, port)
+    connection.connect().result()
+    bank = ft8_bank(args.memories)
+
+    results = {}
+    try:
+        results['recall_sequential_full'] = bench_recall(connection, bank, args.recalls, pipelined=False, full=True)
+        results['recall_pipelined_full'] = bench_recall(connection, bank, args.recalls, pipelined=True, full=True)
+        results['recall_pipelined_delta'] = bench_recall(connection, bank, args.recalls, pipelined=True, full=False)
+        results['scan'] = {'scan_steps_per_second': bench_scan(connection, bank, args.scan_seconds)}
+    finally:
+        connection.stop()
+    results['ingest'] = {'ingest_lines_per_second': bench_ingest(args.ingest_lines, args.seed)}
+
+    for name, value in flatten(results).items():
+        print(f"{name:45s} {value:12.2f}")
+
+    if args.json:
+        with open(args.json, "w") as results_file:
+            json.dump(results, results_file, indent=2)
+
+    if args.baseline:
+        with open(args.baseline, "r") as baseline_file:
+            regressions = compare(results, json.load(baseline_file), args.tolerance)
+        if regressions:
+            print("\nRegressions:")
+            for regression in regressions:
+                print(f"  {regression}")
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
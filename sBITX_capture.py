@@ -0,0 +1,212 @@
+"""
+Session capture files and deterministic replay.
+
+A capture starts with an 8 byte magic and the wall-clock start time, followed by
+one record per event: microseconds since the start, the kind (received, sent,
+opened, closed) and the length, then the bytes themselves. Received bytes are
+stored raw, before telnet negotiation is stripped, so a replay exercises the
+whole receive path.
+
+CaptureReader maps the file instead of reading it, so opening a multi-hour
+capture costs nothing and records are decoded as they are reached.
+
+ReplayConnection stands in for RadioConnection. It feeds the recorded bytes
+through the same telnet stripping, StreamDemux framing and reply matching, in
+real time, scaled, or as fast as possible (speed 0). Commands recorded as sent
+are expected again so replies and decode lines are split as they were live.
+Commands sent by the user during a replay are answered at once and go nowhere.
+"""
+
+import asyncio
+import mmap
+import struct
+import threading
+import time
+
+from sBITX_connection import CLOSED, IAC, OPENED, RECEIVED, SENT, RadioConnection
+
+MAGIC = b"SBXCAP1\n"
+HEADER = struct.Struct("<8sd")
+RECORD = struct.Struct("<QBI")
+
+
+class CaptureError(Exception):
+    pass
+
+
+class CaptureWriter:
+    def __init__(self, path):
+        self.path = path
+        self.file = open(path, "wb", buffering=1 << 16)
+        self.file.write(HEADER.pack(MAGIC, time.time()))
+        self.started = time.monotonic()
+        self.records = 0
+        self.lock = threading.Lock()
+
+    def write(self, kind, data=b""):
+        offset = int((time.monotonic() - self.started) * 1000000)
+        with self.lock:
+            if self.file is None:
+                return
+            self.file.write(RECORD.pack(offset, kind, len(data)))
+            self.file.write(data)
+            self.records += 1
+            # Once per socket read, so a run that is killed keeps everything up to its last read
+            if kind in (RECEIVED, CLOSED):
+                self.file.flush()
+
+    def close(self):
+        with self.lock:
+            if self.file is not None:
+                self.file.close()
+                self.file = None
+
+
+class CaptureReader:
+    def __init__(self, path):
+        self.path = path
+        with open(path, "rb") as capture_file:
+            try:
+                self.map = mmap.mmap(capture_file.fileno(), 0, access=mmap.ACCESS_READ)
+            except ValueError:
+                raise CaptureError(f"{path} is empty") from None
+        if len(self.map) < HEADER.size:
+            self.close()
+            raise CaptureError(f"{path} is not a capture file")
+        magic, self.started = HEADER.unpack_from(self.map, 0)
+        if magic != MAGIC:
+            self.close()
+            raise CaptureError(f"{path} is not a capture file")
+
+    def __iter__(self):
+        # (seconds since the start, kind, bytes). A record cut short by a crash ends the capture
+        data = self.map
+        size = len(data)
+        offset = HEADER.size
+        while offset + RECORD.size <= size:
+            micros, kind, length = RECORD.unpack_from(data, offset)
+            start = offset + RECORD.size
+            offset = start + length
+            if offset > size:
+                break
+            yield micros / 1000000, kind, data[start:offset]
+
+    def duration(self):
+        # Walks the record headers only, the payloads are never touched
+        data = self.map
+        offset = HEADER.size
+        last = 0
+        while offset + RECORD.size <= len(data):
+            micros, _, length = RECORD.unpack_from(data, offset)
+            offset += RECORD.size + length
+            if offset <= len(data):
+                last = micros
+        return last / 1000000
+
+    def close(self):
+        self.map.close()
+
+
+def ignore_result(future):
+    # Nobody waits for the replies to recorded commands, don't log their timeouts
+    if not future.cancelled():
+        future.exception()
+
+
+class ReplayConnection(RadioConnection):
+    def __init__(self, path, speed=1.0, stats=None, read_timeout=1.0):
+        super().__init__(path, 0, read_timeout=read_timeout, stats=stats)
+        self.path = path
+        self.speed = speed
+        self.capture_reader = None
+        self.replay_task = None
+        self.records = 0
+        self.finished = None
+
+    @property
+    def connected(self):
+        return self.replay_task is not None and not self.replay_task.done()
+
+    async def _connect(self):
+        if self.replay_task is None:
+            self.capture_reader = CaptureReader(self.path)
+            self.finished = self.loop.create_future()
+            self.replay_task = asyncio.ensure_future(self._replay())
+            self.status = "Replaying"
+        return ''
+
+    async def _close(self):
+        if self.replay_task:
+            self.replay_task.cancel()
+            try:
+                await self.replay_task
+            except asyncio.CancelledError:
+                pass
+        self.status = "Not connected"
+        self._fail_pending(ConnectionError("Replay closed"))
+
+    async def _send(self, command):
+        return ''
+
+    async def _send_batch(self, commands, pipelined):
+        return [(command, True, '') for command in commands]
+
+    def _write(self, data):
+        pass
+
+    def _expect_recorded(self, command):
+        self._expect(command).add_done_callback(ignore_result)
+
+    async def _replay(self):
+        started = self.loop.time()
+        total = self.capture_reader.duration()
+        shown = -1
+        try:
+            for seconds, kind, data in self.capture_reader:
+                if self.speed:
+                    delay = started + seconds / self.speed - self.loop.time()
+                    if delay > 0:
+                        await asyncio.sleep(delay)
+                elif self.records % 256 == 0:
+                    # Let the loop run the reply timeouts and any close request
+                    await asyncio.sleep(0)
+                self.records += 1
+
+                if kind == RECEIVED:
+                    self._dispatch(self._strip_telnet(data))
+                elif kind == SENT:
+                    # Telnet negotiation replies are written on their own, they get no reply
+                    if data[:1] != bytes([IAC]):
+                        for command in data.split(b'\r\n')[:-1]:
+                            self._expect_recorded(command.decode('ascii', 'replace'))
+                elif kind == OPENED:
+                    # Like _connect, a fresh stream that starts with the greeting
+                    self.demux.reset()
+                    self.iac_state = None
+                    self._fail_pending(ConnectionError("Connection closed"))
+                    self._expect_recorded('')
+                elif kind == CLOSED:
+                    self._fail_pending(ConnectionError("Connection closed"))
+
+                if int(seconds) != shown:
+                    shown = int(seconds)
+                    self.status = f"Replaying {format_time(seconds)} of {format_time(total)}"
+        finally:
+            self._fail_pending(ConnectionError("Replay finished"))
+            self.capture_reader.close()
+            self.status = f"Replay finished, {self.records} records"
+            if not self.finished.done():
+                self.finished.set_result(self.records)
+
+    def wait(self):
+        # A concurrent future that completes with the record count when the replay ends
+        return self.submit(self._wait())
+
+    async def _wait(self):
+        return await asyncio.shield(self.finished)
+
+
+def format_time(seconds):
+    minutes, seconds = divmod(int(seconds), 60)
+    hours, minutes = divmod(minutes, 60)
+    return f"{hours}:{minutes:02}:{seconds:02}" if hours else f"{minutes}:{seconds:02}"
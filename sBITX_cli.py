@@ -0,0 +1,476 @@
+#!/usr/bin/env python3
+
+"""
+Headless sBITX Manager for scripts, cron jobs and SSH sessions on the radio.
+
+It uses the same memory file, radio profiles, connection, recall planning and
+scan scheduler as the GUI, without importing tkinter. Only argparse and json are
+loaded up front, the radio modules are imported by the subcommand that needs them.
+
+Examples:
+    ./sBITX_cli.py list --mode FT8
+    ./sBITX_cli.py recall 14074
+    ./sBITX_cli.py scan --bank ft8 --dwell 30
+    ./sBITX_cli.py tail-decodes --json
+    ./sBITX_cli.py daemon --bank 20m --output decodes.jsonl
+    ./sBITX_cli.py --capture night.sbxcap daemon --bank ft8
+    ./sBITX_cli.py replay night.sbxcap --speed 0
+"""
+
+import argparse
+import json
+import os
+import sys
+import threading
+import time
+
+CONFIG_FILE = "sbmanager_config.json"
+SETTINGS_FILE = "sbmanager_settings.json"
+
+
+def default_path(name):
+    # The working directory like the GUI, else next to this script so it also works from cron
+    if os.path.exists(name):
+        return name
+    return os.path.join(os.path.dirname(os.path.realpath(__file__)), name)
+
+
+def load_profile(args):
+    from sBITX_radios import DEFAULT_PROFILE
+
+    profiles = [DEFAULT_PROFILE]
+    try:
+        with open(args.settings, "r") as settings_file:
+            profiles = json.load(settings_file).get("radios") or profiles
+    except FileNotFoundError:
+        pass
+
+    if args.radio:
+        profile = next((profile for profile in profiles if profile["name"] == args.radio), None)
+        if profile is None:
+            raise SystemExit(f"No radio named '{args.radio}', known radios: {', '.join(p['name'] for p in profiles)}")
+    else:
+        profile = profiles[0]
+    profile = dict(profile)
+    if args.host:
+        profile["host"] = args.host
+    if args.port:
+        profile["port"] = args.port
+    return profile
+
+
+def load_bank(args):
+    from sBITX_memory import MemoryBank
+    from sBITX_storage import MemoryStore
+
+    return MemoryBank(MemoryStore(args.config).load())
+
+
+def select_memories(bank, args):
+    # --bank is a band name such as 20m or a mode such as ft8, --band and --mode narrow it further
+    from sBITX_bands import BAND_NAMES
+
+    band = args.band
+    mode = args.mode
+    if args.bank:
+        if args.bank.lower() in (name.lower() for name in BAND_NAMES):
+            band = next(name for name in BAND_NAMES if name.lower() == args.bank.lower())
+        else:
+            mode = args.bank
+    return bank.filter(band=band, mode=mode)
+
+
+def describe(memory):
+    return f"#{memory['id']} {memory['text']} {memory.get('mode', '')}".rstrip()
+
+
+class Session:
+    """One radio driven the way the GUI drives it: recalls go through the command worker."""
+
+    def __init__(self, profile, full=False, pipelined=True, capture=None):
+        from sBITX_radios import Radio
+
+        self.radio = Radio(profile)
+        self.full = full
+        self.pipelined = pipelined
+        if capture:
+            from sBITX_capture import CaptureWriter
+
+            self.radio.capture = CaptureWriter(capture)
+
+    def open(self):
+        from sBITX_connection import RadioConnection
+
+        radio = self.radio
+        connection = RadioConnection(radio.host, radio.port, stats=radio.stats, capture=radio.capture)
+        try:
+            connection.connect().result(timeout=connection.connect_timeout * 2)
+        except Exception as e:
+            connection.stop()
+            raise SystemExit(f"Could not connect to {radio.host}:{radio.port}: {e}")
+        radio.connection = connection
+        radio.state.invalidate()
+
+    def supervise(self, on_lost=None, on_restored=None, on_retry=None):
+        radio = self.radio
+
+        def lost():
+            radio.executor.pause()
+            if on_lost:
+                on_lost()
+
+        def restored(results):
+            radio.state.apply_results(results)
+            radio.executor.resume()
+            if on_restored:
+                on_restored()
+
+        radio.connection.supervise(replay=radio.state.replay_commands, on_lost=lost, on_restored=restored,
+                                   on_retry=on_retry)
+
+    def recall(self, memory):
+        return self.radio.recall(memory, self.full, self.pipelined)
+
+    def send(self, command):
+        return self.radio.send(command)
+
+    def decodes(self, timeout=0.5):
+        # (line, records) for each decode line, (None, []) when nothing came in within timeout
+        import queue
+
+        messages = self.radio.connection.messages
+        try:
+            line = messages.get(timeout=timeout)
+        except queue.Empty:
+            return None, []
+        return line, self.radio.parser.feed(line)
+
+    def close(self):
+        self.radio.stop()
+
+
+class Output:
+    """Decode lines as text or JSON lines, on stdout or appended to a file."""
+
+    def __init__(self, as_json, path=None, radio_name=None):
+        self.as_json = as_json
+        self.radio_name = radio_name
+        self.stream = open(path, "a", buffering=1) if path else sys.stdout
+        # Status events come from the connection thread
+        self.lock = threading.Lock()
+
+    def write(self, item):
+        text = json.dumps(item, separators=(",", ":")) if self.as_json else str(item)
+        with self.lock:
+            self.stream.write(text + "\n")
+
+    def decode(self, line, records):
+        if not self.as_json:
+            text = line.translate(str.maketrans("", "", "{}\r")).strip()
+            if text:
+                self.write(text)
+            return
+        for record in records:
+            item = record.as_dict()
+            item["type"] = "decode"
+            if self.radio_name:
+                item["radio"] = self.radio_name
+            self.write(item)
+
+    def event(self, kind, **fields):
+        if self.as_json:
+            self.write(dict(type=kind, time=time.time(), **fields))
+        else:
+            print(f"{kind}: " + " ".join(f"{key}={value}" for key, value in fields.items()), file=sys.stderr)
+
+    def flush(self):
+        with self.lock:
+            self.stream.flush()
+
+    def close(self):
+        if self.stream is not sys.stdout:
+            self.stream.close()
+
+
+def stream(session, output, scanner=None, activity=None, reconnecting=False, api=None):
+    # Copy decodes to the output, flushed whenever the backlog has been written
+    radio = session.radio
+    while True:
+        line, records = session.decodes()
+        if line is None:
+            output.flush()
+            if not reconnecting and not radio.link_up:
+                raise SystemExit("Connection to the sBITX lost")
+            continue
+        output.decode(line, records)
+        if radio.connection.messages.empty():
+            output.flush()
+        if records:
+            if api:
+                api.publish(radio.name, records)
+            if scanner:
+                scanner.note_activity()
+            if activity:
+                activity.record(radio.current_memory_id, radio.parser.band, len(records))
+
+
+def command_list(args):
+    bank = load_bank(args)
+    for memory in select_memories(bank, args):
+        print(f"{memory['id']:>4}  {memory['text']:>10}  {memory.get('mode', ''):<8} BW {memory.get('bandwidth', '')}"
+              f"  IF {memory.get('if_setting', '')}  AGC {memory.get('agc_setting', '')}")
+
+
+def command_recall(args):
+    bank = load_bank(args)
+    memory = bank.find(args.name)
+    if memory is None:
+        raise SystemExit(f"No memory '{args.name}' in {args.config}")
+
+    session = Session(load_profile(args), full=args.full, capture=args.capture)
+    session.open()
+    try:
+        results = session.recall(memory).result(timeout=30)
+        failed = [command for command, ok, _ in results if not ok]
+        if failed:
+            raise SystemExit(f"Recall of {describe(memory)} failed: {', '.join(failed)}")
+        print(f"Recalled {describe(memory)} on {session.radio.name}")
+    finally:
+        session.close()
+
+
+def command_tail(args):
+    session = Session(load_profile(args), capture=args.capture)
+    output = Output(args.json, radio_name=session.radio.name)
+    session.open()
+    try:
+        stream(session, output)
+    finally:
+        output.flush()
+        session.close()
+
+
+def command_scan(args, daemon=False):
+    from sBITX_activity import ActivityModel
+    from sBITX_scan import ScanScheduler
+
+    bank = load_bank(args)
+    # scan with no selection goes through the whole bank like Start Scan in the GUI,
+    # the daemon without one only listens on whatever the radio is tuned to
+    selected = args.bank or args.band or args.mode
+    memories = select_memories(bank, args) if selected or not daemon else None
+    if memories is not None and not memories:
+        raise SystemExit("No memories match the scan selection" if selected else f"No memories in {args.config}")
+
+    session = Session(load_profile(args), full=args.full, capture=args.capture)
+    output = Output(args.json, path=getattr(args, "output", None), radio_name=session.radio.name)
+    session.open()
+
+    activity = ActivityModel()
+    scanner = None
+    api = None
+    if memories:
+        def recall(memory):
+            output.event("recall", id=memory['id'], text=memory['text'], mode=memory.get('mode'))
+            return session.recall(memory)
+
+        scanner = ScanScheduler(recall, default_dwell=args.dwell, activity=activity)
+        scanner.weighted = args.weighted
+        scanner.hold_on_activity = args.hold
+
+    try:
+        if daemon:
+            # Hold the scan while the radio is away, it carries on once the settings are replayed
+            def lost():
+                if scanner:
+                    scanner.pause()
+                output.event("status", status="lost")
+
+            def restored():
+                if scanner:
+                    scanner.resume()
+                output.event("status", status="restored")
+
+            def retry(attempt, error):
+                output.event("status", status="retrying", attempt=attempt, error=str(error))
+
+            session.supervise(on_lost=lost, on_restored=restored, on_retry=retry)
+            output.event("status", status="connected", radio=session.radio.name)
+            if args.api:
+                from sBITX_api import ControlServer
+
+                api = ControlServer(api_handler(session, bank), port=args.api)
+                output.event("api", port=api.start().result(timeout=5))
+        if scanner:
+            scanner.start(lambda: memories)
+        stream(session, output, scanner, activity, reconnecting=daemon, api=api)
+    finally:
+        if scanner:
+            scanner.stop()
+        if api:
+            api.stop()
+        output.flush()
+        output.close()
+        session.close()
+
+
+def command_replay(args):
+    # Feed a capture through the connection, parser and output, then report the throughput
+    import queue
+
+    from sBITX_capture import CaptureError, ReplayConnection
+    from sBITX_decode import DecodeParser
+    from sBITX_stats import ConnectionStats
+
+    stats = ConnectionStats()
+    connection = ReplayConnection(args.path, speed=args.speed, stats=stats)
+    try:
+        connection.connect().result(timeout=5)
+    except (CaptureError, OSError) as e:
+        connection.stop()
+        raise SystemExit(f"Could not replay {args.path}: {e}")
+
+    parser = DecodeParser()
+    output = Output(args.json, radio_name="replay") if not args.quiet else None
+    finished = connection.wait()
+    started = time.monotonic()
+    lines = 0
+    decodes = 0
+    try:
+        while True:
+            try:
+                line = connection.messages.get(timeout=0.1)
+            except queue.Empty:
+                if finished.done() and connection.messages.empty():
+                    break
+                continue
+            records = parser.feed(line)
+            stats.record_decodes(1)
+            lines += 1
+            decodes += len(records)
+            if output:
+                output.decode(line, records)
+    finally:
+        if output:
+            output.flush()
+        connection.stop()
+
+    elapsed = time.monotonic() - started
+    rate = lines / elapsed if elapsed > 0 else 0.0
+    print(f"{finished.result()} records, {lines} lines, {decodes} decodes in {elapsed:.2f} s ({rate:.0f} lines/s)",
+          file=sys.stderr)
+    if args.stats:
+        json.dump(stats.snapshot(), sys.stderr, indent=2)
+        print(file=sys.stderr)
+
+
+def api_handler(session, bank):
+    # Control API requests for the daemon's one radio, called on the API thread
+    from concurrent.futures import Future
+
+    from sBITX_api import RequestError, fan_out_result, radio_status
+    from sBITX_radios import gather
+
+    radio = session.radio
+
+    def handle(op, request):
+        future = Future()
+        if request.get("radio") and request["radio"] != radio.name:
+            future.set_exception(RequestError(f"no radio named '{request['radio']}'"))
+        elif op == "state":
+            future.set_result({radio.name: radio_status(radio, bank)})
+        elif op == "memories":
+            future.set_result([dict(memory) for memory in bank])
+        elif op == "recall":
+            memory = bank.find(request.get("memory", ""))
+            if memory is None:
+                future.set_exception(RequestError(f"no memory '{request.get('memory', '')}'"))
+            else:
+                fan_out_result(gather({radio.name: session.recall(memory)}), future)
+        else:
+            command = str(request.get("command", "")).strip()
+            if not command:
+                future.set_exception(RequestError("no command"))
+            else:
+                fan_out_result(gather({radio.name: session.send(command)}), future)
+        return future
+
+    return handle
+
+
+def command_daemon(args):
+    command_scan(args, daemon=True)
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="sbitx-manager", description="Headless sBITX Manager")
+    parser.add_argument("--config", default=default_path(CONFIG_FILE), help="memory file")
+    parser.add_argument("--settings", default=default_path(SETTINGS_FILE), help="settings file with the radio profiles")
+    parser.add_argument("--radio", help="radio profile name, the first profile by default")
+    parser.add_argument("--host", help="override the radio host")
+    parser.add_argument("--port", type=int, help="override the radio telnet port")
+    parser.add_argument("--capture", metavar="PATH", help="record every byte to and from the radio to a capture file")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    def add_selection(command):
+        command.add_argument("--bank", help="band (e.g. 20m) or mode (e.g. ft8) to select memories by")
+        command.add_argument("--band", help="only memories on this band")
+        command.add_argument("--mode", help="only memories in this mode")
+
+    listing = commands.add_parser("list", help="list the stored memories")
+    add_selection(listing)
+    listing.set_defaults(handler=command_list)
+
+    recall = commands.add_parser("recall", help="tune the radio to a memory")
+    recall.add_argument("name", help="frequency as stored (e.g. 14074), or #ID")
+    recall.add_argument("--full", action="store_true", help="send every setting, not just the ones that differ")
+    recall.set_defaults(handler=command_recall)
+
+    for name, handler, help_text in (("scan", command_scan, "scan memories and print decodes"),
+                                     ("daemon", command_daemon, "stream decodes as JSON lines, reconnecting as needed")):
+        command = commands.add_parser(name, help=help_text)
+        add_selection(command)
+        command.add_argument("--dwell", type=float, default=5.0, help="seconds per memory without its own dwell")
+        command.add_argument("--weighted", action="store_true", help="stay longer on memories with recent decodes")
+        command.add_argument("--hold", action="store_true", help="hold the scan while decodes come in")
+        command.add_argument("--full", action="store_true", help="send every setting on each recall")
+        if name == "daemon":
+            command.add_argument("--output", help="append JSON lines to this file instead of stdout")
+            command.add_argument("--api", type=int, metavar="PORT", help="share the radio through the local control API")
+            command.set_defaults(json=True)
+        else:
+            command.add_argument("--json", action="store_true", help="one JSON object per decode")
+        command.set_defaults(handler=handler)
+
+    tail = commands.add_parser("tail-decodes", help="print decodes as they arrive")
+    tail.add_argument("--json", action="store_true", help="one JSON object per decode")
+    tail.set_defaults(handler=command_tail)
+
+    replay = commands.add_parser("replay", help="play a capture file back through the decode path")
+    replay.add_argument("path", help="capture file written with --capture or Main > Record Session")
+    replay.add_argument("--speed", type=float, default=1.0, help="1 for real time, 0 for as fast as possible")
+    replay.add_argument("--json", action="store_true", help="one JSON object per decode")
+    replay.add_argument("--quiet", action="store_true", help="only print the throughput")
+    replay.add_argument("--stats", action="store_true", help="also print the command round-trip stats")
+    replay.set_defaults(handler=command_replay)
+    return parser
+
+
+def main(argv=None):
+    import signal
+
+    args = build_parser().parse_args(argv)
+    # Stop cleanly on SIGTERM from systemd, cron or kill, the same as Ctrl-C, so
+    # captures and output files are closed
+    signal.signal(signal.SIGTERM, lambda *_: sys.exit(0))
+    try:
+        args.handler(args)
+    except KeyboardInterrupt:
+        pass
+    except BrokenPipeError:
+        # The reader went away, e.g. piped into head. Keep the interpreter from complaining on exit
+        os.dup2(os.open(os.devnull, os.O_WRONLY), sys.stdout.fileno())
+
+
+if __name__ == "__main__":
+    main()
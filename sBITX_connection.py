@@ -0,0 +1,494 @@
+"""
+Asyncio based connection to the sBITX telnet server.
+
+All socket I/O runs on a dedicated event-loop thread. The GUI talks to it through
+send() and send_batch(), which return concurrent.futures.Future objects and never block.
+
+Once supervise() is called the connection also watches itself: a read error, EOF or
+DEAD_TIMEOUTS replies in a row that never came drop the socket, and it is reopened
+with exponential backoff until the radio answers again. The sBITX has no documented
+command that is safe to send just to get a reply, so a quiet link is checked with
+TCP keepalive instead of probe commands.
+
+With a capture (see sBITX_capture) every byte sent and received is recorded with
+its time, for replaying the session later.
+"""
+
+import asyncio
+import queue
+import random
+import socket
+import sys
+import threading
+from collections import deque
+
+PROMPT = b'>'
+
+# Read timeouts after which a reply that never came is given up on for good
+STALE_TIMEOUTS = 3
+# Reply timeouts in a row after which a supervised link is taken for dead. A busy
+# link (a scan) is never idle long enough for TCP keepalive to notice a radio that
+# was switched off
+DEAD_TIMEOUTS = 3
+
+# Capture record kinds
+RECEIVED = 0
+SENT = 1
+OPENED = 2
+CLOSED = 3
+
+# Telnet protocol bytes, the sBITX server may open with option negotiation
+IAC = 255
+DONT = 254
+DO = 253
+WONT = 252
+WILL = 251
+SB = 250
+SE = 240
+
+
+class StreamDemux:
+    """
+    Incremental framer for the single byte stream coming from the radio.
+
+    Text up to a '>' prompt is the reply to the oldest outstanding command.
+    Brace-wrapped lines are decoder output and are split out even while a reply
+    is being collected, as is any complete line that arrives with no command waiting.
+    """
+
+    def __init__(self):
+        self.buffer = bytearray()
+        self.reply = bytearray()
+
+    def reset(self):
+        self.buffer.clear()
+        self.reply.clear()
+
+    def feed(self, data, waiting):
+        buf = self.buffer
+        buf += data
+        replies = []
+        lines = []
+        pos = 0
+
+        while pos < len(buf):
+            newline = buf.find(b'\n', pos)
+            prompt = buf.find(PROMPT, pos)
+
+            start = pos
+            while start < len(buf) and buf[start] in b' \t\r':
+                start += 1
+            if start == len(buf) and newline < 0:
+                break
+
+            if buf[start:start + 1] == b'{':
+                # Decoded message, may contain '>' so only a newline ends it
+                if newline < 0:
+                    break
+                lines.append(bytes(buf[pos:newline + 1]))
+                pos = newline + 1
+            elif prompt >= 0 and (newline < 0 or prompt < newline):
+                self.reply += buf[pos:prompt + 1]
+                pos = prompt + 1
+                if waiting:
+                    replies.append(bytes(self.reply))
+                    waiting -= 1
+                elif self.reply.strip(b' \t\r\n>'):
+                    lines.append(bytes(self.reply[:-1]))
+                self.reply.clear()
+            elif newline >= 0:
+                if waiting:
+                    self.reply += buf[pos:newline + 1]
+                elif buf[pos:newline + 1].strip():
+                    lines.append(bytes(buf[pos:newline + 1]))
+                pos = newline + 1
+            else:
+                break
+
+        del buf[:pos]
+        return replies, lines
+
+
+class PendingReply:
+    def __init__(self, command, future, sent):
+        self.command = command
+        self.future = future
+        self.sent = sent
+        self.timeout_handle = None
+
+
+class RadioConnection:
+    def __init__(self, host, port, connect_timeout=5.0, read_timeout=1.0, stats=None,
+                 keepalive_interval=15.0, keepalive_misses=2, min_backoff=1.0, max_backoff=60.0, capture=None):
+        self.host = host
+        self.port = port
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+        # Optional ConnectionStats, fed round-trip times and timeouts from the loop thread
+        self.stats = stats
+        # Optional CaptureWriter, written from the loop thread
+        self.capture = capture
+
+        # Supervisor settings, in seconds
+        self.keepalive_interval = keepalive_interval
+        self.keepalive_misses = keepalive_misses
+        self.min_backoff = min_backoff
+        self.max_backoff = max_backoff
+        self.status = "Not connected"
+
+        # Decoded message lines, the GUI drains this from the Tk thread
+        self.messages = queue.Queue()
+
+        self.loop = None
+        self.loop_thread = None
+        self.reader = None
+        self.writer = None
+        self.reader_task = None
+        self.pending = deque()
+        self.timeouts_in_row = 0
+        self.demux = StreamDemux()
+        self.iac_state = None
+
+        self.supervisor_task = None
+        self.lost = None
+        self.replay = None
+        self.on_lost = None
+        self.on_restored = None
+        self.on_retry = None
+
+    @property
+    def connected(self):
+        return self.writer is not None and not self.writer.is_closing()
+
+    def start_loop(self):
+        if self.loop is None:
+            self.loop = asyncio.new_event_loop()
+            self.loop_thread = threading.Thread(target=self.loop.run_forever, name="sbitx-connection", daemon=True)
+            self.loop_thread.start()
+
+    def submit(self, coro):
+        self.start_loop()
+        return asyncio.run_coroutine_threadsafe(coro, self.loop)
+
+    def connect(self):
+        return self.submit(self._connect())
+
+    def send(self, command):
+        return self.submit(self._send(command))
+
+    def send_batch(self, commands, pipelined=True):
+        return self.submit(self._send_batch(commands, pipelined))
+
+    def supervise(self, replay=None, on_lost=None, on_restored=None, on_retry=None):
+        """
+        Reconnect automatically from now on. All callbacks run on the loop thread:
+        on_lost() when the link drops, replay() for the commands to send as soon as it
+        is back, on_restored(results) with the replies to those commands, and
+        on_retry(attempt, error) after each failed attempt (else it goes to stderr).
+        """
+        self.replay = replay
+        self.on_lost = on_lost
+        self.on_restored = on_restored
+        self.on_retry = on_retry
+        return self.submit(self._start_supervisor())
+
+    def close(self):
+        if self.loop is None:
+            return None
+        return self.submit(self._close())
+
+    def stop(self):
+        # Close the socket and shut the event-loop thread down
+        if self.loop is None:
+            return
+        try:
+            self.close().result(timeout=self.connect_timeout)
+        except Exception as e:
+            print(f"Error closing connection: {e}", file=sys.stderr)
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self.loop_thread.join(timeout=self.connect_timeout)
+        self.loop.close()
+        self.loop = None
+
+    async def _connect(self):
+        if self.connected:
+            return ''
+        self.reader, self.writer = await asyncio.wait_for(
+            asyncio.open_connection(self.host, self.port), timeout=self.connect_timeout)
+        self._set_keepalive(self.writer.get_extra_info('socket'))
+        self._record(OPENED, f"{self.host}:{self.port}".encode())
+        self.demux.reset()
+        self.iac_state = None
+        self.timeouts_in_row = 0
+        self.reader_task = asyncio.ensure_future(self._read_loop())
+        self.status = "Connected"
+
+        # The server greets with a prompt, wait for it like any other reply
+        banner = self._expect('')
+        try:
+            return await banner
+        except asyncio.TimeoutError:
+            # No greeting, don't let it swallow the first command reply
+            self._discard(banner)
+            return ''
+
+    async def _close(self):
+        if self.supervisor_task:
+            self.supervisor_task.cancel()
+            self.supervisor_task = None
+        if self.reader_task:
+            self.reader_task.cancel()
+            self.reader_task = None
+        if self.writer:
+            self._record(CLOSED)
+            self.writer.close()
+            try:
+                await self.writer.wait_closed()
+            except OSError:
+                pass
+        self.reader = None
+        self.writer = None
+        self.status = "Not connected"
+        self._fail_pending(ConnectionError("Connection closed"))
+
+    async def _start_supervisor(self):
+        if self.supervisor_task is None:
+            self.lost = asyncio.Event()
+            if not self.connected:
+                self.lost.set()
+            self.supervisor_task = asyncio.ensure_future(self._supervise())
+
+    async def _supervise(self):
+        while True:
+            await self._watch()
+            self.status = "Connection lost"
+            if self.on_lost:
+                self.on_lost()
+            results = await self._reconnect()
+            if self.on_restored:
+                self.on_restored(results)
+
+    async def _watch(self):
+        # Returns once the link is dead. Decodes and replies show it is alive, and a
+        # quiet link that stopped answering TCP keepalive fails the read loop
+        await self.lost.wait()
+
+    def _set_keepalive(self, sock):
+        # Idle for keepalive_interval, then keepalive_misses unanswered probes drop it
+        if sock is None:
+            return
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1)
+        interval = max(1, int(self.keepalive_interval))
+        # TCP_KEEPIDLE is called TCP_KEEPALIVE on macOS
+        idle = getattr(socket, 'TCP_KEEPIDLE', getattr(socket, 'TCP_KEEPALIVE', None))
+        for option, value in ((idle, interval),
+                              (getattr(socket, 'TCP_KEEPINTVL', None), interval),
+                              (getattr(socket, 'TCP_KEEPCNT', None), max(1, self.keepalive_misses))):
+            if option is not None:
+                try:
+                    sock.setsockopt(socket.IPPROTO_TCP, option, value)
+                except OSError:
+                    pass
+
+    async def _reconnect(self):
+        backoff = self.min_backoff
+        attempt = 0
+        while True:
+            attempt += 1
+            # Full jitter so several managers don't all hit a restarting radio at once
+            delay = random.uniform(backoff / 2, backoff)
+            self.status = f"Connection lost, retrying in {delay:.1f} s (attempt {attempt})"
+            await asyncio.sleep(delay)
+
+            self.status = f"Reconnecting (attempt {attempt})..."
+            self.lost.clear()
+            try:
+                await self._connect()
+            except (OSError, asyncio.TimeoutError) as e:
+                if self.on_retry:
+                    self.on_retry(attempt, e)
+                else:
+                    print(f"Reconnect to the sBITX failed: {e}", file=sys.stderr)
+                self._drop(ConnectionError("Connection lost"))
+                backoff = min(backoff * 2, self.max_backoff)
+                continue
+            if self.stats:
+                self.stats.record_reconnect()
+
+            commands = self.replay() if self.replay else []
+            try:
+                return await self._send_batch(commands, True)
+            except ConnectionError:
+                # Dropped again straight away, keep trying
+                self._drop(ConnectionError("Connection lost"))
+                backoff = min(backoff * 2, self.max_backoff)
+
+    def _drop(self, exc):
+        # Tear the socket down without waiting, the supervisor takes it from here
+        if self.reader_task:
+            self.reader_task.cancel()
+            self.reader_task = None
+        if self.writer:
+            self._record(CLOSED)
+            self.writer.close()
+        self._fail_pending(exc)
+        if self.lost:
+            self.lost.set()
+
+    async def _send(self, command):
+        if not self.connected:
+            raise ConnectionError("Not connected to the sBITX")
+        reply = self._expect(command)
+        self._write(command.encode('ascii') + b'\r\n')
+        await self.writer.drain()
+        return await reply
+
+    async def _send_batch(self, commands, pipelined):
+        if not self.connected:
+            raise ConnectionError("Not connected to the sBITX")
+        if not commands:
+            return []
+
+        if pipelined:
+            replies = [self._expect(cmd) for cmd in commands]
+            self._write(b''.join(cmd.encode('ascii') + b'\r\n' for cmd in commands))
+            await self.writer.drain()
+        else:
+            replies = []
+            for cmd in commands:
+                reply = self._expect(cmd)
+                self._write(cmd.encode('ascii') + b'\r\n')
+                await self.writer.drain()
+                await asyncio.wait([reply])
+                replies.append(reply)
+
+        await asyncio.wait(replies)
+
+        results = []
+        for cmd, reply in zip(commands, replies):
+            if reply.exception() is None:
+                results.append((cmd, True, reply.result()))
+            else:
+                results.append((cmd, False, str(reply.exception())))
+        return results
+
+    def _expect(self, command):
+        future = self.loop.create_future()
+        entry = PendingReply(command, future, self.loop.time())
+        entry.timeout_handle = self.loop.call_later(self.read_timeout, self._expire, entry)
+        self.pending.append(entry)
+        return future
+
+    def _expire(self, entry):
+        # The entry stays queued for a while so a late reply is consumed instead of
+        # shifting every later reply. One that never comes must not take the next
+        # command's reply either, so it is dropped after STALE_TIMEOUTS timeouts
+        if not entry.future.done():
+            entry.future.set_exception(asyncio.TimeoutError(f"No prompt for '{entry.command}'"))
+            if self.stats and entry.command:
+                self.stats.record_timeout(entry.command)
+            self.timeouts_in_row += 1
+        entry.timeout_handle = self.loop.call_later(self.read_timeout * (STALE_TIMEOUTS - 1), self._forget, entry)
+        if self.timeouts_in_row >= DEAD_TIMEOUTS and self.supervisor_task is not None and self.connected:
+            print(f"No reply from the sBITX to {self.timeouts_in_row} commands, reconnecting", file=sys.stderr)
+            self._drop(ConnectionError("Connection timed out"))
+
+    def _forget(self, entry):
+        try:
+            self.pending.remove(entry)
+        except ValueError:
+            pass
+
+    def _discard(self, future):
+        for entry in self.pending:
+            if entry.future is future:
+                entry.timeout_handle.cancel()
+                self.pending.remove(entry)
+                break
+
+    def _fail_pending(self, exc):
+        while self.pending:
+            entry = self.pending.popleft()
+            entry.timeout_handle.cancel()
+            if not entry.future.done():
+                entry.future.set_exception(exc)
+
+    async def _read_loop(self):
+        try:
+            while True:
+                data = await self.reader.read(4096)
+                if not data:
+                    break
+                self._record(RECEIVED, data)
+                self._dispatch(self._strip_telnet(data))
+        except asyncio.CancelledError:
+            raise
+        except OSError as e:
+            print(f"Error reading from the sBITX: {e}", file=sys.stderr)
+
+        if self.writer:
+            self._record(CLOSED)
+            self.writer.close()
+        self._fail_pending(ConnectionError("Connection lost"))
+        if self.lost:
+            self.lost.set()
+
+    def _dispatch(self, data):
+        replies, lines = self.demux.feed(data, len(self.pending))
+
+        if replies:
+            self.timeouts_in_row = 0
+        for reply in replies:
+            entry = self.pending.popleft()
+            entry.timeout_handle.cancel()
+            if not entry.future.done():
+                entry.future.set_result(reply.decode('ascii', 'replace'))
+                if self.stats and entry.command:
+                    self.stats.record_rtt(entry.command, self.loop.time() - entry.sent)
+
+        for line in lines:
+            self.messages.put(line.decode('ascii', 'replace'))
+
+    def _write(self, data):
+        self._record(SENT, data)
+        self.writer.write(data)
+
+    def _record(self, kind, data=b''):
+        if self.capture:
+            self.capture.write(kind, data)
+
+    def _strip_telnet(self, data):
+        # Drop IAC sequences and refuse every option the server asks for
+        if IAC not in data and self.iac_state is None:
+            return data
+
+        out = bytearray()
+        for byte in data:
+            state = self.iac_state
+            if state is None:
+                if byte == IAC:
+                    self.iac_state = IAC
+                else:
+                    out.append(byte)
+            elif state == IAC:
+                if byte == IAC:
+                    out.append(byte)
+                    self.iac_state = None
+                elif byte in (DO, DONT, WILL, WONT):
+                    self.iac_state = byte
+                elif byte == SB:
+                    self.iac_state = SB
+                else:
+                    self.iac_state = None
+            elif state in (DO, DONT, WILL, WONT):
+                if state == DO:
+                    self._write(bytes([IAC, WONT, byte]))
+                elif state == WILL:
+                    self._write(bytes([IAC, DONT, byte]))
+                self.iac_state = None
+            elif state == SB:
+                if byte == IAC:
+                    self.iac_state = SE
+            elif state == SE:
+                self.iac_state = None if byte == SE else SB
+        return bytes(out)
@@ -0,0 +1,229 @@
+"""
+Streaming parser for the FT8 and CW decode text sent by the sBITX, and an
+in-memory index of the resulting records by callsign, grid and band.
+"""
+
+import re
+import time
+from array import array
+
+FT8_LINE = re.compile(r"^\s*(\d{2}:?\d{2}:?\d{2})\s+([-+]?\d+)\s+([-+]?\d+(?:\.\d+)?)\s+(\d+)\s+~?\s*(.*?)\s*$")
+CALLSIGN = re.compile(r"^(?!5NN$)(?:[A-Z0-9]{1,3}/)?[A-Z0-9]{0,2}[0-9][A-Z0-9]{0,4}[A-Z](?:/[A-Z0-9]{1,4})?$")
+GRID = re.compile(r"^[A-R]{2}[0-9]{2}(?:[A-X]{2})?$")
+REPORT = re.compile(r"^R?[-+][0-9]{2}$")
+
+STRIP_CHARS = str.maketrans("", "", "{}\r")
+
+CQ = "CQ"
+GRID_REPLY = "GRID"
+SIGNAL_REPORT = "REPORT"
+ROGER = "RR73"
+SIGN_OFF = "73"
+FREE_TEXT = "TEXT"
+
+
+class DecodeRecord:
+    __slots__ = ("timestamp", "utc", "mode", "snr", "dt", "offset", "msg_type",
+                 "call_to", "call_from", "grid", "band", "frequency", "text")
+
+    def __init__(self, timestamp, mode, text, band=None, frequency=None, utc=None, snr=None, dt=None,
+                 offset=None, msg_type=FREE_TEXT, call_to=None, call_from=None, grid=None):
+        self.timestamp = timestamp
+        self.utc = utc
+        self.mode = mode
+        self.snr = snr
+        self.dt = dt
+        self.offset = offset
+        self.msg_type = msg_type
+        self.call_to = call_to
+        self.call_from = call_from
+        self.grid = grid
+        self.band = band
+        self.frequency = frequency
+        self.text = text
+
+    def callsigns(self):
+        return [call for call in (self.call_from, self.call_to) if call]
+
+    def as_dict(self):
+        return {name: getattr(self, name) for name in self.__slots__}
+
+    def __repr__(self):
+        return f"DecodeRecord({self.mode} {self.utc} {self.snr} {self.call_to} {self.call_from} {self.grid} {self.band})"
+
+
+def clean_callsign(token):
+    # Hashed callsigns are shown as <K1ABC>
+    token = token.strip("<>")
+    if CALLSIGN.match(token):
+        return token
+    return None
+
+
+def classify_ft8(message):
+    tokens = message.split()
+    msg_type = FREE_TEXT
+    call_to = None
+    call_from = None
+    grid = None
+
+    if not tokens:
+        return msg_type, call_to, call_from, grid
+
+    if tokens[0] == "CQ":
+        msg_type = CQ
+        # "CQ K1ABC FN42" or "CQ DX K1ABC FN42"
+        rest = tokens[1:]
+        if len(rest) >= 2 and not clean_callsign(rest[0]) and clean_callsign(rest[1]):
+            rest = rest[1:]
+        if rest:
+            call_from = clean_callsign(rest[0])
+        if len(rest) > 1 and GRID.match(rest[1]):
+            grid = rest[1]
+        return msg_type, call_to, call_from, grid
+
+    if len(tokens) >= 2:
+        call_to = clean_callsign(tokens[0])
+        call_from = clean_callsign(tokens[1])
+        if call_to is None and call_from is None:
+            return msg_type, None, None, None
+
+    last = tokens[-1] if len(tokens) >= 3 else ""
+    if last in ("RR73", "RRR"):
+        msg_type = ROGER
+    elif last == "73":
+        msg_type = SIGN_OFF
+    elif REPORT.match(last):
+        msg_type = SIGNAL_REPORT
+    elif GRID.match(last):
+        msg_type = GRID_REPLY
+        grid = last
+
+    return msg_type, call_to, call_from, grid
+
+
+class DecodeParser:
+    """
+    Turns decode text into DecodeRecord objects. Text may be fed in arbitrary
+    chunks, an unterminated trailing line is held until the rest arrives.
+    """
+
+    def __init__(self, band=None, frequency=None):
+        # Band and dial frequency in Hz of the memory the radio is tuned to
+        self.band = band
+        self.frequency = frequency
+        self.partial = ""
+
+    def feed(self, text, timestamp=None):
+        if timestamp is None:
+            timestamp = time.time()
+
+        text = self.partial + text.translate(STRIP_CHARS)
+        lines = text.split("\n")
+        self.partial = lines.pop()
+
+        records = []
+        for line in lines:
+            record = self.parse_line(line, timestamp)
+            if record is not None:
+                records.append(record)
+        return records
+
+    def parse_line(self, line, timestamp):
+        line = line.strip()
+        if not line:
+            return None
+
+        match = FT8_LINE.match(line)
+        if match:
+            utc, snr, dt, offset, message = match.groups()
+            msg_type, call_to, call_from, grid = classify_ft8(message)
+            return DecodeRecord(timestamp, "FT8", message, band=self.band, frequency=self.frequency,
+                                utc=utc.replace(":", ""), snr=int(snr), dt=float(dt), offset=int(offset),
+                                msg_type=msg_type, call_to=call_to, call_from=call_from, grid=grid)
+
+        # Anything else is CW or free text, keep the callsigns that can be found in it
+        calls = [call for call in (clean_callsign(token) for token in line.upper().split()) if call]
+        call_from = calls[-1] if calls else None
+        call_to = calls[0] if len(calls) > 1 else None
+        return DecodeRecord(timestamp, "CW", line, band=self.band, frequency=self.frequency,
+                            call_to=call_to, call_from=call_from)
+
+
+class DecodeIndex:
+    """
+    Time ordered record store with position lists per callsign, grid and band.
+
+    Records arrive in time order, so every position list is sorted by time as
+    well and "since" queries are a binary search over it.
+    """
+
+    def __init__(self, max_records=200000):
+        self.max_records = max_records
+        self.records = []
+        self.times = array("d")
+        self.by_call = {}
+        self.by_grid = {}
+        self.by_band = {}
+
+    def __len__(self):
+        return len(self.records)
+
+    def add(self, record):
+        if len(self.records) >= self.max_records:
+            self.compact()
+
+        position = len(self.records)
+        self.records.append(record)
+        self.times.append(record.timestamp)
+
+        for call in record.callsigns():
+            self.by_call.setdefault(call, []).append(position)
+        if record.grid:
+            # Index both the four character square and its two character field
+            self.by_grid.setdefault(record.grid[:4], []).append(position)
+            self.by_grid.setdefault(record.grid[:2], []).append(position)
+        if record.band:
+            self.by_band.setdefault(record.band, []).append(position)
+
+    def extend(self, records):
+        for record in records:
+            self.add(record)
+
+    def compact(self):
+        # Drop the oldest half and rebuild, amortised over max_records / 2 additions
+        keep = self.records[len(self.records) // 2:]
+        self.records = []
+        self.times = array("d")
+        self.by_call = {}
+        self.by_grid = {}
+        self.by_band = {}
+        for record in keep:
+            self.add(record)
+
+    def _since(self, positions, since):
+        if since is None:
+            return [self.records[p] for p in positions]
+
+        low, high = 0, len(positions)
+        while low < high:
+            mid = (low + high) // 2
+            if self.times[positions[mid]] < since:
+                low = mid + 1
+            else:
+                high = mid
+        return [self.records[p] for p in positions[low:]]
+
+    def heard(self, callsign, since=None):
+        return self._since(self.by_call.get(callsign.upper(), []), since)
+
+    def last_heard(self, callsign):
+        positions = self.by_call.get(callsign.upper())
+        return self.records[positions[-1]] if positions else None
+
+    def in_grid(self, grid, since=None):
+        # Accepts a field ("FN") or a square ("FN42")
+        return self._since(self.by_grid.get(grid.upper()[:4], []), since)
+
+    def on_band(self, band, since=None):
+        return self._since(self.by_band.get(band, []), since)
@@ -1,20 +1,28 @@
 #!/usr/bin/env python3
 
+import csv
 import tkinter as tk
-from tkinter import messagebox
-import json
+from tkinter import filedialog, messagebox
+
+from sBITX_import import export_memories, import_memories
+from sBITX_memory import MemoryBank
+from sBITX_storage import MemoryStore, StoreConflict
+from sBITX_views import MemoryListView
 
 class ReorderGUI:
-    def __init__(self, master, items):
+    def __init__(self, master, items, store, full_save=False):
         self.master = master
         self.master.title("sBITX Manager Memory Editor")
         self.items = items
+        self.store = store
+        # Files written before memories had IDs are saved whole the first time
+        self.full_save = full_save
 
         self.listbox = tk.Listbox(self.master, selectmode=tk.SINGLE, font=("Helvetica", 14, "bold"))
         self.listbox.pack(expand=True, fill=tk.BOTH)
 
-        for item in self.items:
-            self.listbox.insert(tk.END, item['text'])
+        self.view = MemoryListView(self.listbox, lambda item: item['text'])
+        self.view.set_rows(self.items)
 
         up_button = tk.Button(self.master, text="Up", command=self.move_up, font=("Helvetica", 14, "bold"))
         up_button.pack(side=tk.LEFT, padx=10)
@@ -25,6 +33,12 @@ class ReorderGUI:
         save_button = tk.Button(self.master, text="Save Order", command=self.save_order, font=("Helvetica", 14, "bold"))
         save_button.pack(side=tk.LEFT, padx=10)
 
+        import_button = tk.Button(self.master, text="Import", command=self.import_items, font=("Helvetica", 14, "bold"))
+        import_button.pack(side=tk.LEFT, padx=10)
+
+        export_button = tk.Button(self.master, text="Export", command=self.export_items, font=("Helvetica", 14, "bold"))
+        export_button.pack(side=tk.LEFT, padx=10)
+
         exit_button = tk.Button(self.master, text="Exit", command=self.exit_application, font=("Helvetica", 14, "bold"))
         exit_button.pack(side=tk.LEFT, padx=10)
 
@@ -33,39 +47,96 @@ class ReorderGUI:
         if selected_index and selected_index[0] > 0:
             selected_index = int(selected_index[0])
             self.items[selected_index], self.items[selected_index - 1] = self.items[selected_index - 1], self.items[selected_index]
-            self.update_listbox(selected_index - 1)
+            self.view.move(selected_index, selected_index - 1)
 
     def move_down(self):
         selected_index = self.listbox.curselection()
         if selected_index and selected_index[0] < len(self.items) - 1:
             selected_index = int(selected_index[0])
             self.items[selected_index], self.items[selected_index + 1] = self.items[selected_index + 1], self.items[selected_index]
-            self.update_listbox(selected_index + 1)
-
-    def update_listbox(self, new_index):
-        self.listbox.delete(0, tk.END)
-        for item in self.items:
-            self.listbox.insert(tk.END, item['text'])
-        self.listbox.selection_set(new_index)
+            self.view.move(selected_index, selected_index + 1)
 
     def save_order(self):
         try:
-            with open("sbmanager_config.json", "w") as config_file:
-                json.dump(self.items, config_file)
+            if self.full_save:
+                self.store.save(self.items)
+                self.full_save = False
+            elif self.store.append({'op': 'order', 'ids': [item['id'] for item in self.items]}, self.items):
+                # sBITX Manager changed the memories meanwhile, show the merged result
+                self.reload()
             messagebox.showinfo("Save Order", "Order saved successfully.")
+        except StoreConflict:
+            if messagebox.askyesno("Memories Changed", "sbmanager_config.json was changed by sBITX Manager.\n\nOverwrite it with this order?"):
+                self.store.save(self.items, force=True)
+                self.full_save = False
+            else:
+                self.reload()
         except Exception as e:
             messagebox.showerror("Error", f"Failed to save order: {e}")
 
+    def import_items(self):
+        path = filedialog.askopenfilename(title="Import Memories",
+                                          filetypes=[("Memory lists", "*.csv *.adi *.adif"), ("All files", "*")])
+        if not path:
+            return
+        if self.store.is_stale():
+            self.reload()
+
+        try:
+            result = import_memories(path, self.items)
+        except (OSError, UnicodeDecodeError, csv.Error) as e:
+            messagebox.showerror("Import", f"Failed to read {path}: {e}")
+            return
+
+        if result.memories:
+            bank = MemoryBank(self.items)
+            bank.extend(result.memories)
+            self.items = bank.memories
+            # One save for the whole import
+            try:
+                self.store.save(self.items)
+                self.full_save = False
+            except StoreConflict:
+                if messagebox.askyesno("Memories Changed", "sbmanager_config.json was changed by sBITX Manager.\n\nOverwrite it with the imported memories?"):
+                    self.store.save(self.items, force=True)
+                    self.full_save = False
+                else:
+                    self.reload()
+                    return
+            except OSError as e:
+                messagebox.showerror("Error", f"Failed to save memories: {e}")
+            self.view.set_rows(self.items)
+        messagebox.showinfo("Import", result.summary())
+
+    def export_items(self):
+        path = filedialog.asksaveasfilename(title="Export Memories", defaultextension=".csv",
+                                            filetypes=[("CSV", "*.csv"), ("CHIRP CSV", "*.chirp.csv"), ("ADIF", "*.adi")])
+        if not path:
+            return
+        if path.lower().endswith((".adi", ".adif")):
+            fmt = "adif"
+        elif path.lower().endswith(".chirp.csv"):
+            fmt = "chirp"
+        else:
+            fmt = "csv"
+        try:
+            export_memories(path, self.items, fmt)
+        except OSError as e:
+            messagebox.showerror("Export", f"Failed to write {path}: {e}")
+
+    def reload(self):
+        self.items = MemoryBank(self.store.load()).memories
+        self.view.set_rows(self.items)
+
     def exit_application(self):
         self.master.destroy()
 
 if __name__ == "__main__":
-    try:
-        with open("sbmanager_config.json", "r") as config_file:
-            items = json.load(config_file)
-    except FileNotFoundError:
-        items = []
+    store = MemoryStore("sbmanager_config.json")
+    items = store.load()
+    missing_ids = any(not isinstance(item.get('id'), int) for item in items)
+    items = MemoryBank(items).memories
 
     root = tk.Tk()
-    reorder_app = ReorderGUI(root, items)
+    reorder_app = ReorderGUI(root, items, store, full_save=missing_ids)
     root.mainloop()
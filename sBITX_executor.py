@@ -0,0 +1,116 @@
+"""
+Command worker that keeps radio traffic off the Tk thread.
+
+Jobs are queued with a command class. A job that has not been sent yet is
+replaced by a newer job of the same class, so clicking quickly through memories
+only recalls the last one, and repeated agc or bw changes collapse to the last value.
+The newer job goes to the back of the queue, so whatever the user did last is
+also applied last.
+While paused (the radio is reconnecting) jobs are held, up to max_pending of them.
+"""
+
+import queue
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future
+from itertools import count
+
+from sBITX_state import TRACKED_COMMANDS
+
+
+def command_class(command):
+    # Setting commands coalesce per setting, anything else is always sent
+    word = command.strip().split(None, 1)[0].lower() if command.strip() else ''
+    return word if word in TRACKED_COMMANDS else None
+
+
+class Job:
+    def __init__(self, action, label):
+        self.action = action
+        self.label = label
+        self.future = Future()
+
+
+class CommandExecutor:
+    def __init__(self, max_pending=32, job_timeout=10.0):
+        self.max_pending = max_pending
+        self.job_timeout = job_timeout
+        self.jobs = OrderedDict()
+        self.unique = count()
+        self.condition = threading.Condition()
+        self.running = True
+        self.paused = False
+        self.status = "Ready"
+
+        self.thread = threading.Thread(target=self.run, name="sbitx-commands", daemon=True)
+        self.thread.start()
+
+    def submit(self, key, action, label=""):
+        """
+        Queue action, a callable run on the worker thread that returns a future
+        or a result. Returns a future for the outcome. key=None never coalesces.
+        """
+        job = Job(action, label)
+        with self.condition:
+            if key is None:
+                key = ("unique", next(self.unique))
+            replaced = self.jobs.get(key)
+            if replaced is not None:
+                # Latest wins, and runs after everything queued before it
+                replaced.future.cancel()
+                self.jobs[key] = job
+                self.jobs.move_to_end(key)
+            elif len(self.jobs) >= self.max_pending:
+                job.future.set_exception(queue.Full("Too many commands waiting for the sBITX"))
+                return job.future
+            else:
+                self.jobs[key] = job
+            self.condition.notify()
+        return job.future
+
+    def pending(self):
+        with self.condition:
+            return len(self.jobs)
+
+    def pause(self):
+        with self.condition:
+            self.paused = True
+
+    def resume(self):
+        with self.condition:
+            self.paused = False
+            self.condition.notify()
+
+    def stop(self):
+        with self.condition:
+            self.running = False
+            for job in self.jobs.values():
+                job.future.cancel()
+            self.jobs.clear()
+            self.condition.notify()
+        self.thread.join(timeout=self.job_timeout)
+
+    def run(self):
+        while True:
+            with self.condition:
+                while self.running and (self.paused or not self.jobs):
+                    self.condition.wait()
+                if not self.running:
+                    return
+                _, job = self.jobs.popitem(last=False)
+
+            if not job.future.set_running_or_notify_cancel():
+                continue
+
+            self.status = f"Sending {job.label}..." if job.label else "Sending..."
+            try:
+                result = job.action()
+                if isinstance(result, Future):
+                    result = result.result(timeout=self.job_timeout)
+            except Exception as e:
+                self.status = f"Failed {job.label}: {e}"
+                job.future.set_exception(e)
+                continue
+
+            self.status = f"Done {job.label}" if job.label else "Ready"
+            job.future.set_result(result)
@@ -0,0 +1,183 @@
+"""
+Persistent decode history in a local SQLite database.
+
+Records are queued by the GUI and written by a background thread in batched
+transactions, so the decode path never waits on the disk. Queries page through
+results newest first using the row id as the page key.
+"""
+
+import queue
+import sqlite3
+import sys
+import threading
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS decodes (
+    id INTEGER PRIMARY KEY,
+    timestamp REAL NOT NULL,
+    frequency INTEGER,
+    band TEXT,
+    mode TEXT,
+    utc TEXT,
+    snr INTEGER,
+    dt REAL,
+    offset INTEGER,
+    msg_type TEXT,
+    call_from TEXT,
+    call_to TEXT,
+    grid TEXT,
+    text TEXT
+);
+CREATE INDEX IF NOT EXISTS decodes_timestamp ON decodes (timestamp);
+CREATE INDEX IF NOT EXISTS decodes_frequency ON decodes (frequency);
+CREATE INDEX IF NOT EXISTS decodes_call_from ON decodes (call_from);
+CREATE INDEX IF NOT EXISTS decodes_call_to ON decodes (call_to);
+"""
+
+COLUMNS = ("id", "timestamp", "frequency", "band", "mode", "utc", "snr", "dt", "offset",
+           "msg_type", "call_from", "call_to", "grid", "text")
+
+INSERT = ("INSERT INTO decodes (timestamp, frequency, band, mode, utc, snr, dt, offset, msg_type, "
+          "call_from, call_to, grid, text) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)")
+
+
+def open_database(path):
+    connection = sqlite3.connect(path)
+    try:
+        connection.execute("PRAGMA journal_mode=WAL")
+        connection.execute("PRAGMA synchronous=NORMAL")
+    except sqlite3.Error:
+        connection.close()
+        raise
+    return connection
+
+
+class DecodeHistory:
+    def __init__(self, path, batch_size=500, flush_interval=1.0):
+        self.path = path
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.queue = queue.Queue()
+
+        connection = open_database(path)
+        try:
+            connection.executescript(SCHEMA)
+        finally:
+            connection.close()
+
+        self.writer_thread = threading.Thread(target=self.write_loop, name="sbitx-history", daemon=True)
+        self.writer_thread.start()
+
+    def add(self, record):
+        self.queue.put((record.timestamp, record.frequency, record.band, record.mode, record.utc,
+                        record.snr, record.dt, record.offset, record.msg_type, record.call_from,
+                        record.call_to, record.grid, record.text))
+
+    def extend(self, records):
+        for record in records:
+            self.add(record)
+
+    def close(self):
+        # Flush whatever is queued and stop the writer
+        self.queue.put(None)
+        self.writer_thread.join()
+
+    def write_loop(self):
+        connection = open_database(self.path)
+        running = True
+        while running:
+            try:
+                row = self.queue.get(timeout=self.flush_interval)
+            except queue.Empty:
+                continue
+
+            batch = []
+            while row is not None:
+                batch.append(row)
+                if len(batch) >= self.batch_size:
+                    break
+                try:
+                    row = self.queue.get_nowait()
+                except queue.Empty:
+                    break
+            if row is None:
+                running = False
+
+            if batch:
+                try:
+                    with connection:
+                        connection.executemany(INSERT, batch)
+                except sqlite3.Error as e:
+                    print(f"Error writing decode history: {e}", file=sys.stderr)
+        connection.close()
+
+    def query(self, callsign=None, band=None, min_frequency=None, max_frequency=None,
+              since=None, until=None, page_size=100):
+        return HistoryQuery(self.path, callsign, band, min_frequency, max_frequency, since, until, page_size)
+
+
+class HistoryQuery:
+    """
+    Lazily pages through matching decodes, newest first. Each next_page() call
+    is one indexed query starting below the last row id already returned.
+    """
+
+    def __init__(self, path, callsign, band, min_frequency, max_frequency, since, until, page_size):
+        self.path = path
+        self.page_size = page_size
+        self.last_id = None
+        self.finished = False
+        self.connection = None
+
+        self.where = []
+        self.params = []
+        if callsign:
+            self.where.append("(call_from = ? OR call_to = ?)")
+            self.params += [callsign.upper(), callsign.upper()]
+        if band:
+            self.where.append("band = ?")
+            self.params.append(band)
+        if min_frequency is not None:
+            self.where.append("frequency >= ?")
+            self.params.append(min_frequency)
+        if max_frequency is not None:
+            self.where.append("frequency <= ?")
+            self.params.append(max_frequency)
+        if since is not None:
+            self.where.append("timestamp >= ?")
+            self.params.append(since)
+        if until is not None:
+            self.where.append("timestamp < ?")
+            self.params.append(until)
+
+    def next_page(self):
+        if self.finished:
+            return []
+        if self.connection is None:
+            self.connection = sqlite3.connect(self.path)
+            self.connection.row_factory = sqlite3.Row
+
+        where = list(self.where)
+        params = list(self.params)
+        if self.last_id is not None:
+            where.append("id < ?")
+            params.append(self.last_id)
+
+        sql = f"SELECT {', '.join(COLUMNS)} FROM decodes"
+        if where:
+            sql += " WHERE " + " AND ".join(where)
+        sql += " ORDER BY id DESC LIMIT ?"
+        params.append(self.page_size)
+
+        rows = self.connection.execute(sql, params).fetchall()
+        if rows:
+            self.last_id = rows[-1]["id"]
+        if len(rows) < self.page_size:
+            self.close()
+        return rows
+
+    def close(self):
+        self.finished = True
+        if self.connection is not None:
+            self.connection.close()
+            self.connection = None
@@ -0,0 +1,334 @@
+"""
+Bulk import and export of memory banks.
+
+Three formats are read and written:
+    csv    - this program's own columns (frequency, mode, bandwidth, if, agc, dwell, priority)
+    chirp  - CSV as exported by CHIRP, frequency in MHz
+    adif   - ADIF records, one memory per FREQ / MODE pair, e.g. a log or a band list
+
+Readers are generators, so files are parsed row by row. Every row is validated
+and normalised to what FrequencyInputDialog offers and checked against the
+existing bank for a duplicate (same frequency and mode) in the same pass.
+A row needs a frequency and a mode. A missing bandwidth, IF or AGC is filled in
+from DEFAULT_SETTINGS (500 Hz bandwidth for CW), and such rows are counted.
+"""
+
+import csv
+import math
+import re
+
+from sBITX_bands import band_for_frequency, frequency_hz
+from sBITX_memory import AGC_OPTIONS, MODE_OPTIONS
+
+FORMATS = ["csv", "chirp", "adif"]
+
+CSV_FIELDS = ["frequency", "mode", "bandwidth", "if", "agc", "dwell", "priority"]
+CHIRP_FIELDS = ["Location", "Name", "Frequency", "Duplex", "Offset", "Tone", "rToneFreq", "cToneFreq",
+                "DtcsCode", "DtcsPolarity", "RxDtcsCode", "CrossMode", "Mode", "TStep", "Skip", "Power",
+                "Comment", "URCALL", "RPT1CALL", "RPT2CALL", "DVCODE"]
+
+# Other programs' names for the sBITX modes. 'SSB' is resolved by frequency
+MODE_ALIASES = {
+    'CW-R': 'CWR', 'CWREV': 'CWR', 'NCW': 'CW', 'NCWR': 'CWR',
+    'PSK31': 'PSK', 'PSK63': 'PSK', 'BPSK': 'PSK', 'BPSK31': 'PSK',
+    'DIG': 'Digital', 'DATA': 'Digital', 'PKT': 'Digital', 'FT4': 'Digital', 'JT65': 'Digital', 'WSPR': 'Digital',
+    # The sBITX has no AM mode, AM stations are tuned in USB
+    'AM': 'USB', 'NAM': 'USB', 'DSB': 'USB',
+}
+AGC_ALIASES = {'MEDIUM': 'Med', 'MID': 'Med', 'NONE': 'Off'}
+
+# Settings for rows that don't carry them, CHIRP files never do
+DEFAULT_SETTINGS = {'bandwidth': '3000', 'if_setting': '50', 'agc_setting': 'Slow'}
+DEFAULT_BANDWIDTHS = {'CW': '500', 'CWR': '500'}
+
+# sBITX mode to CHIRP mode, anything else is exported as DIG with the mode as its name
+CHIRP_MODES = {'LSB': 'LSB', 'USB': 'USB', 'CW': 'CW', 'CWR': 'CWR', 'RTTY': 'RTTY'}
+# sBITX mode to ADIF MODE and SUBMODE
+ADIF_MODES = {'LSB': ('SSB', 'LSB'), 'USB': ('SSB', 'USB'), 'CW': ('CW', None), 'CWR': ('CW', None),
+              'FT8': ('FT8', None), 'PSK': ('PSK', 'PSK31'), 'RTTY': ('RTTY', None)}
+ADIF_APP = "APP_SBITXMANAGER_"
+
+ADIF_TAG = re.compile(r"<([A-Za-z0-9_]+)(?::(\d+)(?::[A-Za-z])?)?>")
+
+_MODES = {mode.upper(): mode for mode in MODE_OPTIONS}
+_AGCS = {agc.upper(): agc for agc in AGC_OPTIONS}
+
+
+class ImportResult:
+    def __init__(self):
+        self.memories = []
+        self.duplicates = 0
+        self.defaulted = 0
+        self.errors = []
+        self.error_count = 0
+
+    def add_error(self, where, message, keep=20):
+        self.error_count += 1
+        if len(self.errors) < keep:
+            self.errors.append(f"{where}: {message}")
+
+    def summary(self):
+        lines = [f"{len(self.memories)} memories imported, {self.duplicates} duplicates skipped, "
+                 f"{self.error_count} rows rejected."]
+        if self.defaulted:
+            lines.append(f"{self.defaulted} memories got the default bandwidth, IF or AGC.")
+        lines += self.errors
+        if self.error_count > len(self.errors):
+            lines.append(f"... and {self.error_count - len(self.errors)} more")
+        return "\n".join(lines)
+
+
+def memory_key(memory):
+    return frequency_hz(memory.get('text')), str(memory.get('mode', '')).upper()
+
+
+def normalise_mode(mode, hz):
+    value = str(mode or '').strip().upper()
+    if not value:
+        return ''
+    if value == 'SSB':
+        return 'LSB' if hz < 10000000 else 'USB'
+    if value in _MODES:
+        return _MODES[value]
+    if value in MODE_ALIASES:
+        return MODE_ALIASES[value]
+    raise ValueError(f"unsupported mode '{mode}'")
+
+
+def normalise_number(name, value, low, high, kind=int):
+    text = str(value or '').strip()
+    if not text:
+        return ''
+    try:
+        number = float(text)
+    except ValueError:
+        number = None
+    if number is None or not math.isfinite(number):
+        raise ValueError(f"{name} '{value}' is not a number")
+    number = kind(number)
+    if not low <= number <= high:
+        raise ValueError(f"{name} {number} is outside {low}-{high}")
+    return str(number)
+
+
+def normalise_memory(row):
+    """
+    Turn a row with frequency (kHz, or Hz), mode, bandwidth, if, agc, dwell and
+    priority into a memory dict. Raises ValueError for anything the dialog would not accept.
+    Missing settings are left empty, see fill_defaults.
+    """
+    hz = frequency_hz(row.get('frequency'))
+    if hz is None:
+        raise ValueError(f"bad frequency '{row.get('frequency')}'")
+    if not 100000 <= hz <= 30000000:
+        raise ValueError(f"frequency {hz} Hz is outside the sBITX range")
+
+    agc = str(row.get('agc') or '').strip().upper()
+    if agc:
+        agc = AGC_ALIASES.get(agc, _AGCS.get(agc))
+        if agc is None:
+            raise ValueError(f"unsupported AGC '{row.get('agc')}'")
+
+    mode = normalise_mode(row.get('mode'), hz)
+    if not mode:
+        raise ValueError("no mode")
+
+    memory = {
+        # Stored in kHz like the dialog entries
+        'text': f"{hz / 1000:.3f}".rstrip('0').rstrip('.'),
+        'mode': mode,
+        'bandwidth': normalise_number("bandwidth", row.get('bandwidth'), 50, 20000),
+        'if_setting': normalise_number("IF", row.get('if'), 0, 100),
+        'agc_setting': agc or '',
+    }
+    dwell = normalise_number("dwell", row.get('dwell'), 0, 3600, kind=float)
+    if dwell:
+        memory['dwell'] = dwell
+    if str(row.get('priority') or '').strip().lower() in ('1', 'true', 'yes', 'y'):
+        memory['priority'] = True
+    return memory
+
+
+def fill_defaults(memory):
+    # Returns True if any setting had to be filled in
+    filled = False
+    for key, value in DEFAULT_SETTINGS.items():
+        if not memory.get(key):
+            memory[key] = DEFAULT_BANDWIDTHS.get(memory['mode'], value) if key == 'bandwidth' else value
+            filled = True
+    return filled
+
+
+def read_csv(path):
+    with open(path, "r", newline="", encoding="utf-8-sig") as csv_file:
+        reader = csv.DictReader(csv_file)
+        fields = {name.strip().lower(): name for name in reader.fieldnames or []}
+        for row in reader:
+            yield reader.line_num, {field: row.get(fields.get(field, field)) for field in CSV_FIELDS}
+
+
+def read_chirp(path):
+    with open(path, "r", newline="", encoding="utf-8-sig") as csv_file:
+        reader = csv.DictReader(csv_file)
+        for row in reader:
+            mode = (row.get('Mode') or '').strip()
+            name = (row.get('Name') or '').strip().upper()
+            if mode.upper() == 'DIG' and name in _MODES:
+                # Written by export_chirp, the sBITX mode is kept in the name
+                mode = name
+            try:
+                frequency = str(int(round(float(row.get('Frequency') or '') * 1000000)))
+            except (ValueError, OverflowError):
+                frequency = row.get('Frequency')
+            yield reader.line_num, {'frequency': frequency, 'mode': mode}
+
+
+def adif_records(path, chunk_size=65536):
+    # Streaming ADIF reader, yields (record number, {FIELD: value}) and skips the header
+    with open(path, "r", encoding="utf-8", errors="replace") as adif_file:
+        buffer = adif_file.read(chunk_size)
+        # Anything before the first tag is a free text header
+        in_header = not buffer.startswith('<')
+        record = {}
+        number = 0
+        pos = 0
+        while True:
+            match = ADIF_TAG.search(buffer, pos)
+            end = match.end() + int(match.group(2) or 0) if match else 0
+            if match is None or end > len(buffer):
+                more = adif_file.read(chunk_size)
+                if not more:
+                    return
+                buffer = buffer[match.start() if match else pos:] + more
+                pos = 0
+                continue
+
+            name = match.group(1).upper()
+            pos = end
+            if name == 'EOH':
+                in_header = False
+                record = {}
+            elif name == 'EOR':
+                number += 1
+                yield number, record
+                record = {}
+            elif not in_header:
+                record[name] = buffer[match.end():end]
+
+
+def read_adif(path):
+    for number, record in adif_records(path):
+        try:
+            frequency = str(int(round(float(record.get('FREQ', '')) * 1000000)))
+        except (ValueError, OverflowError):
+            frequency = None
+        mode = record.get(ADIF_APP + 'MODE') or record.get('SUBMODE') or record.get('MODE')
+        if mode and mode.upper() not in _MODES and mode.upper() not in MODE_ALIASES and record.get('MODE'):
+            # Unknown submode, fall back to the main mode
+            mode = record['MODE']
+        yield f"record {number}", {
+            'frequency': frequency, 'mode': mode,
+            'bandwidth': record.get(ADIF_APP + 'BANDWIDTH'), 'if': record.get(ADIF_APP + 'IF'),
+            'agc': record.get(ADIF_APP + 'AGC'), 'dwell': record.get(ADIF_APP + 'DWELL'),
+            'priority': record.get(ADIF_APP + 'PRIORITY'),
+        }
+
+
+READERS = {'csv': read_csv, 'chirp': read_chirp, 'adif': read_adif}
+
+
+def detect_format(path):
+    if path.lower().endswith(('.adi', '.adif')):
+        return 'adif'
+    with open(path, "r", newline="", encoding="utf-8-sig") as csv_file:
+        header = csv_file.readline()
+    columns = {name.strip() for name in header.split(',')}
+    return 'chirp' if {'Location', 'Frequency', 'Mode'} <= columns else 'csv'
+
+
+def import_memories(path, existing=(), fmt=None):
+    """
+    Read a file and return an ImportResult with the new memories, in file order.
+    Rows matching a memory in existing, or an earlier row, are counted as duplicates.
+    """
+    result = ImportResult()
+    seen = {memory_key(memory) for memory in existing}
+    for where, row in READERS[fmt or detect_format(path)](path):
+        try:
+            memory = normalise_memory(row)
+        except ValueError as e:
+            result.add_error(f"line {where}" if isinstance(where, int) else where, e)
+            continue
+        key = memory_key(memory)
+        if key in seen:
+            result.duplicates += 1
+            continue
+        seen.add(key)
+        if fill_defaults(memory):
+            result.defaulted += 1
+        result.memories.append(memory)
+    return result
+
+
+def export_csv(path, memories):
+    with open(path, "w", newline="") as csv_file:
+        writer = csv.writer(csv_file)
+        writer.writerow(CSV_FIELDS)
+        for memory in memories:
+            writer.writerow([memory.get('text', ''), memory.get('mode', ''), memory.get('bandwidth', ''),
+                             memory.get('if_setting', ''), memory.get('agc_setting', ''),
+                             memory.get('dwell', ''), 'yes' if memory.get('priority') else ''])
+
+
+def export_chirp(path, memories):
+    with open(path, "w", newline="") as csv_file:
+        writer = csv.writer(csv_file)
+        writer.writerow(CHIRP_FIELDS)
+        for location, memory in enumerate(memories, 1):
+            hz = frequency_hz(memory.get('text'))
+            if hz is None:
+                continue
+            mode = str(memory.get('mode', '')).upper()
+            writer.writerow([location, mode if mode not in CHIRP_MODES else '', f"{hz / 1000000:.6f}", '',
+                             "0.000000", '', "88.5", "88.5", "023", "NN", "023", "Tone->Tone",
+                             CHIRP_MODES.get(mode, 'DIG'), "5.00", '', "5.0W", '', '', '', '', ''])
+
+
+def adif_field(name, value):
+    value = str(value)
+    return f"<{name}:{len(value)}>{value} "
+
+
+def export_adif(path, memories):
+    with open(path, "w", encoding="utf-8") as adif_file:
+        adif_file.write("sBITX Manager memory bank\n" + adif_field("ADIF_VER", "3.1.4")
+                        + adif_field("PROGRAMID", "sBITX Manager") + "<EOH>\n")
+        for memory in memories:
+            hz = frequency_hz(memory.get('text'))
+            if hz is None:
+                continue
+            mode = str(memory.get('mode', '')).upper()
+            fields = [adif_field("FREQ", f"{hz / 1000000:.6f}")]
+            band = band_for_frequency(hz)
+            if band:
+                fields.append(adif_field("BAND", band))
+            adif_mode, submode = ADIF_MODES.get(mode, (None, None))
+            if adif_mode:
+                fields.append(adif_field("MODE", adif_mode))
+            if submode:
+                fields.append(adif_field("SUBMODE", submode))
+            # The exact sBITX settings, for reading the file back in here
+            for name, key in (("MODE", 'mode'), ("BANDWIDTH", 'bandwidth'), ("IF", 'if_setting'),
+                              ("AGC", 'agc_setting'), ("DWELL", 'dwell')):
+                if memory.get(key):
+                    fields.append(adif_field(ADIF_APP + name, memory[key]))
+            if memory.get('priority'):
+                fields.append(adif_field(ADIF_APP + "PRIORITY", "Y"))
+            adif_file.write("".join(fields) + "<EOR>\n")
+
+
+WRITERS = {'csv': export_csv, 'chirp': export_chirp, 'adif': export_adif}
+
+
+def export_memories(path, memories, fmt):
+    WRITERS[fmt](path, memories)
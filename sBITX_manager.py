@@ -10,15 +10,40 @@ License: MIT License
 Copyright (c) 2023 J. Kujawa
 """
 
+import sys
+
+if __name__ == "__main__" and len(sys.argv) > 1:
+    # Arguments mean a command line run, hand it to the headless tool before tkinter is loaded
+    from sBITX_cli import main
+    main()
+    sys.exit()
+
 import tkinter as tk
-from tkinter import ttk, simpledialog, messagebox, font, scrolledtext
+from tkinter import ttk, simpledialog, messagebox, font, scrolledtext, filedialog
 import tkinter.simpledialog
-import telnetlib
+import csv
 import json
+import queue
+import sqlite3
 import time
-import threading
-import socket
 import webbrowser
+from collections import deque
+from concurrent.futures import Future
+
+from sBITX_activity import ActivityModel
+from sBITX_api import DEFAULT_PORT, ControlServer, RequestError, fan_out_result, radio_status
+from sBITX_bands import BAND_NAMES, frequency_hz
+from sBITX_capture import CaptureWriter, ReplayConnection
+from sBITX_connection import RadioConnection
+from sBITX_decode import DecodeIndex, GRID
+from sBITX_history import DecodeHistory
+from sBITX_import import export_memories, import_memories
+from sBITX_memory import AGC_OPTIONS, MODE_OPTIONS, MemoryBank
+from sBITX_radios import DEFAULT_PROFILE, RadioPool
+from sBITX_scan import ScanScheduler
+from sBITX_storage import MemoryStore, StoreConflict
+from sBITX_views import MemoryListView
+from sBITX_watchlist import Watchlist, parse_entries
 
 class FrequencyInputDialog(tk.Toplevel):
     def __init__(self, parent, title, initial_values=None):
@@ -30,6 +55,8 @@ class FrequencyInputDialog(tk.Toplevel):
         self.bw_var = tk.StringVar()
         self.if_var = tk.StringVar()
         self.agc_var = tk.StringVar()
+        self.dwell_var = tk.StringVar()
+        self.priority_var = tk.BooleanVar()
 
         if initial_values:
             self.freq_var.set(initial_values.get('text', ''))
@@ -37,6 +64,8 @@ class FrequencyInputDialog(tk.Toplevel):
             self.bw_var.set(initial_values.get('bandwidth', ''))
             self.if_var.set(initial_values.get('if_setting', ''))
             self.agc_var.set(initial_values.get('agc_setting', ''))
+            self.dwell_var.set(initial_values.get('dwell', ''))
+            self.priority_var.set(initial_values.get('priority', False))
 
         font_style = font.Font(family="Helvetica", size=14, weight="bold")
 
@@ -44,8 +73,7 @@ class FrequencyInputDialog(tk.Toplevel):
         ttk.Entry(self, textvariable=self.freq_var, font=font_style).grid(row=0, column=1, columnspan=2, sticky=tk.W)
 
         tk.Label(self, text="Mode:", font=font_style).grid(row=1, column=0, sticky=tk.E)
-        Mode_options = ["LSB", "USB", "CW", "CWR", "FT8", "PSK", "RTTY", "Digital", "2Tone"]
-        ttk.Combobox(self, textvariable=self.mode_var, values=Mode_options, font=font_style).grid(row=1, column=1, columnspan=2, sticky=tk.W)
+        ttk.Combobox(self, textvariable=self.mode_var, values=MODE_OPTIONS, font=font_style).grid(row=1, column=1, columnspan=2, sticky=tk.W)
 
         tk.Label(self, text="Bandwidth:", font=font_style).grid(row=2, column=0, sticky=tk.E)
         ttk.Entry(self, textvariable=self.bw_var, font=font_style).grid(row=2, column=1, columnspan=2, sticky=tk.W)
@@ -54,21 +82,44 @@ class FrequencyInputDialog(tk.Toplevel):
         ttk.Entry(self, textvariable=self.if_var, font=font_style).grid(row=3, column=1, columnspan=2, sticky=tk.W)
 
         tk.Label(self, text="AGC:", font=font_style).grid(row=4, column=0, sticky=tk.E)
-        AGC_options = ["Off", "Slow", "Med", "Fast"]
-        ttk.Combobox(self, textvariable=self.agc_var, values=AGC_options, font=font_style).grid(row=4, column=1, columnspan=2, sticky=tk.W)
+        ttk.Combobox(self, textvariable=self.agc_var, values=AGC_OPTIONS, font=font_style).grid(row=4, column=1, columnspan=2, sticky=tk.W)
+
+        tk.Label(self, text="Scan Dwell (s):", font=font_style).grid(row=5, column=0, sticky=tk.E)
+        ttk.Entry(self, textvariable=self.dwell_var, font=font_style).grid(row=5, column=1, columnspan=2, sticky=tk.W)
+
+        tk.Checkbutton(self, text="Priority Channel", variable=self.priority_var, font=font_style).grid(row=6, column=1, columnspan=2, sticky=tk.W)
 
-        tk.Button(self, text="OK", command=self.ok_button_click, font=font_style).grid(row=5, column=0, columnspan=3, pady=10, padx=10)
+        tk.Button(self, text="OK", command=self.ok_button_click, font=font_style).grid(row=7, column=0, columnspan=3, pady=10, padx=10)
 
     def ok_button_click(self):
         self.destroy()
 
 class MessageWindow(tk.Toplevel):
-    def __init__(self, parent):
+    FLUSH_INTERVAL = 75  # Milliseconds between widget updates
+    STRIP_CHARS = str.maketrans("", "", "{}\r")
+
+    def __init__(self, parent, max_lines=5000):
         super().__init__(parent)
         self.title("Decoded Messages")
 
+        # Ring buffer of the most recent lines, the Text widget only mirrors it. Entries are
+        # chunks as received, history_lines counts the lines in them
+        self.max_lines = max_lines
+        self.history = deque()
+        self.history_lines = 0
+        self.pending = []
+        self.pending_lines = 0
+        # Set once more is pending than the widget can hold, the next flush rebuilds from history
+        self.rebuild = False
+        self.widget_lines = 0
+        self.flush_scheduled = False
+        self.paused = False
+        self.autoscroll = tk.BooleanVar(value=True)
+
         self.response_text = tk.Text(self, wrap=tk.WORD, height=10, width=50, font=("Helvetica", 14, "bold"))
         self.response_text.pack(expand=True, fill=tk.BOTH)
+        # Lines matching the watchlist
+        self.response_text.tag_configure("watch", background="yellow", foreground="black")
 
         button_frame = tk.Frame(self)
         button_frame.pack()
@@ -79,17 +130,118 @@ class MessageWindow(tk.Toplevel):
         increase_font_button = tk.Button(button_frame, text="Larger Text", command=self.increase_font_size, font=("Helvetica", 14, "bold"))
         increase_font_button.pack(side=tk.LEFT)
 
+        self.pause_button = tk.Button(button_frame, text="Pause", command=self.toggle_pause, font=("Helvetica", 14, "bold"))
+        self.pause_button.pack(side=tk.LEFT)
+
+        autoscroll_button = tk.Checkbutton(button_frame, text="Autoscroll", variable=self.autoscroll, font=("Helvetica", 14, "bold"))
+        autoscroll_button.pack(side=tk.LEFT)
+
+        line_limit_button = tk.Button(button_frame, text="Line Limit", command=self.set_line_limit, font=("Helvetica", 14, "bold"))
+        line_limit_button.pack(side=tk.LEFT)
+
         self.protocol("WM_DELETE_WINDOW", self.on_close)
 
-    def append_response(self, response):
+    def append_response(self, response, tag=None):
         # Remove curly braces from the response
-        response = response.replace("{", "").replace("}", "")
-
-        self.response_text.insert(tk.END, response + '')
-        self.response_text.see(tk.END)
+        response = response.translate(self.STRIP_CHARS)
+
+        lines = response.count("\n")
+        self.history.append((response, tag))
+        self.history_lines += max(1, lines)
+        self.trim_history()
+
+        if self.rebuild:
+            pass
+        elif self.pending_lines + lines >= self.max_lines:
+            # Everything pending has scrolled out of the ring buffer anyway, keep nothing more while paused
+            self.pending = []
+            self.pending_lines = 0
+            self.rebuild = True
+        else:
+            # Pending text is kept as runs of lines with the same tag
+            if self.pending and self.pending[-1][1] == tag:
+                self.pending[-1][0].append(response)
+            else:
+                self.pending.append(([response], tag))
+            self.pending_lines += lines
+
+        if not self.flush_scheduled:
+            self.flush_scheduled = True
+            self.after(self.FLUSH_INTERVAL, self.flush)
+
+    def flush(self):
+        # Coalesce everything received since the last frame into one insert
+        self.flush_scheduled = False
+        if self.paused or not (self.pending or self.rebuild):
+            return
+
+        if self.rebuild:
+            # More arrived than the widget can hold, rebuild it from the ring buffer
+            self.response_text.delete(1.0, tk.END)
+            self.insert_runs(self.runs(self.history))
+            self.widget_lines = sum(line.count("\n") for line, _ in self.history)
+        else:
+            self.insert_runs(self.pending)
+            self.widget_lines += self.pending_lines
+        self.pending = []
+        self.pending_lines = 0
+        self.rebuild = False
+
+        self.trim_lines()
+
+        if self.autoscroll.get():
+            self.response_text.see(tk.END)
+
+    def insert_runs(self, runs):
+        # One insert call for all runs, each with its own tag
+        args = []
+        for lines, tag in runs:
+            args += ["".join(lines), tag or ()]
+        self.response_text.insert(tk.END, *args)
+
+    @staticmethod
+    def runs(history):
+        runs = []
+        for line, tag in history:
+            if runs and runs[-1][1] == tag:
+                runs[-1][0].append(line)
+            else:
+                runs.append(([line], tag))
+        return runs
+
+    def trim_history(self):
+        while self.history_lines > self.max_lines and len(self.history) > 1:
+            line, _ = self.history.popleft()
+            self.history_lines -= max(1, line.count("\n"))
+
+    def trim_lines(self):
+        # Trim in bulk once a tenth over the cap instead of one line per insert
+        excess = self.widget_lines - self.max_lines
+        if excess > self.max_lines // 10:
+            self.response_text.delete(1.0, f"{excess + 1}.0")
+            self.widget_lines -= excess
+
+    def toggle_pause(self):
+        self.paused = not self.paused
+        self.pause_button.config(text="Resume" if self.paused else "Pause")
+        if not self.paused:
+            self.flush()
+
+    def set_line_limit(self):
+        user_input = simpledialog.askinteger("Line Limit", "Maximum number of decoded lines to keep:", initialvalue=self.max_lines, minvalue=100, parent=self)
+        if user_input is not None:
+            self.max_lines = user_input
+            self.trim_history()
+            self.trim_lines()
 
     def clear_text(self):
         self.response_text.delete(1.0, tk.END)
+        self.history.clear()
+        self.history_lines = 0
+        self.pending = []
+        self.pending_lines = 0
+        self.rebuild = False
+        self.widget_lines = 0
 
     def on_close(self):
         self.withdraw()
@@ -102,6 +254,276 @@ class MessageWindow(tk.Toplevel):
 
         self.response_text.config(font=("Helvetica", new_size, "bold"))
 
+class HistoryWindow(tk.Toplevel):
+    def __init__(self, parent, history):
+        super().__init__(parent)
+        self.title("Decode History")
+        self.history = history
+        self.query = None
+
+        font_style = ("Helvetica", 14, "bold")
+
+        search_frame = tk.Frame(self)
+        search_frame.pack(fill=tk.X)
+
+        self.call_var = tk.StringVar()
+        self.band_var = tk.StringVar()
+        self.hours_var = tk.StringVar()
+
+        tk.Label(search_frame, text="Call:", font=font_style).pack(side=tk.LEFT)
+        ttk.Entry(search_frame, textvariable=self.call_var, width=10, font=font_style).pack(side=tk.LEFT)
+        tk.Label(search_frame, text="Band:", font=font_style).pack(side=tk.LEFT)
+        ttk.Combobox(search_frame, textvariable=self.band_var, values=[""] + BAND_NAMES, width=6, font=font_style).pack(side=tk.LEFT)
+        tk.Label(search_frame, text="Hours:", font=font_style).pack(side=tk.LEFT)
+        ttk.Entry(search_frame, textvariable=self.hours_var, width=5, font=font_style).pack(side=tk.LEFT)
+        tk.Button(search_frame, text="Search", command=self.search, font=font_style).pack(side=tk.LEFT)
+
+        self.listbox = tk.Listbox(self, font=("Helvetica", 12), width=70, height=25)
+        self.listbox.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+        self.scrollbar = tk.Scrollbar(self, command=self.listbox.yview)
+        self.scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+        self.listbox.config(yscrollcommand=self.on_scroll)
+
+        self.search()
+
+    def search(self):
+        if self.query:
+            self.query.close()
+
+        since = None
+        try:
+            if self.hours_var.get().strip():
+                since = time.time() - float(self.hours_var.get()) * 3600
+        except ValueError:
+            messagebox.showerror("Decode History", "Hours must be a number.", parent=self)
+            return
+
+        self.query = self.history.query(callsign=self.call_var.get().strip() or None,
+                                        band=self.band_var.get() or None, since=since)
+        self.listbox.delete(0, tk.END)
+        self.load_more()
+
+    def load_more(self):
+        if self.query is None or self.query.finished:
+            return
+        for row in self.query.next_page():
+            heard_at = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(row["timestamp"]))
+            snr = f"{row['snr']:+d} " if row["snr"] is not None else ""
+            self.listbox.insert(tk.END, f"{heard_at}  {row['band'] or ''}  {snr}{row['text']}")
+
+    def on_scroll(self, first, last):
+        # Fetch the next page only when the user scrolls to the end
+        self.scrollbar.set(first, last)
+        if float(last) >= 1.0:
+            self.after_idle(self.load_more)
+
+    def destroy(self):
+        if self.query:
+            self.query.close()
+        super().destroy()
+
+class RefreshingWindow(tk.Toplevel):
+    # A window redrawn every REFRESH_INTERVAL while it is shown
+    REFRESH_INTERVAL = 1000  # ms
+
+    def __init__(self, parent):
+        super().__init__(parent)
+        self.refresh_job = None
+
+    def refresh(self):
+        # Also called directly, so drop the pending run rather than start a second loop
+        self.cancel_refresh()
+        self.refresh_job = self.after(self.REFRESH_INTERVAL, self.refresh)
+        if self.state() == "normal":
+            self.redraw()
+
+    def cancel_refresh(self):
+        if self.refresh_job is not None:
+            self.after_cancel(self.refresh_job)
+            self.refresh_job = None
+
+    def redraw(self):
+        # Overridden with the window's own drawing
+        pass
+
+    def withdraw(self):
+        self.cancel_refresh()
+        super().withdraw()
+
+    def deiconify(self):
+        super().deiconify()
+        self.refresh()
+
+    def destroy(self):
+        self.cancel_refresh()
+        super().destroy()
+
+class StatsWindow(RefreshingWindow):
+    COLUMNS = [("count", "Count"), ("p50_ms", "p50 ms"), ("p95_ms", "p95 ms"), ("p99_ms", "p99 ms"),
+               ("max_ms", "Max ms"), ("timeouts", "Timeouts")]
+
+    def __init__(self, parent, stats, name=""):
+        super().__init__(parent)
+        self.title(f"Stats - {name}" if name else "Stats")
+        self.stats = stats
+
+        font_style = ("Helvetica", 14, "bold")
+
+        self.tree = ttk.Treeview(self, columns=[name for name, _ in self.COLUMNS], height=12)
+        self.tree.heading("#0", text="Command")
+        self.tree.column("#0", width=110)
+        for name, heading in self.COLUMNS:
+            self.tree.heading(name, text=heading)
+            self.tree.column(name, width=90, anchor=tk.E)
+        self.tree.pack(fill=tk.BOTH, expand=True)
+
+        self.summary_var = tk.StringVar()
+        tk.Label(self, textvariable=self.summary_var, font=font_style, anchor=tk.W).pack(fill=tk.X)
+
+        button_frame = tk.Frame(self)
+        button_frame.pack(fill=tk.X)
+        tk.Button(button_frame, text="Export CSV", command=lambda: self.export("csv"), font=font_style).pack(side=tk.LEFT)
+        tk.Button(button_frame, text="Export JSON", command=lambda: self.export("json"), font=font_style).pack(side=tk.LEFT)
+        tk.Button(button_frame, text="Reset", command=self.reset, font=font_style).pack(side=tk.LEFT)
+
+        self.refresh()
+
+    def redraw(self):
+        snapshot = self.stats.snapshot()
+        for word, row in snapshot["commands"].items():
+            values = [row[name] for name, _ in self.COLUMNS]
+            if self.tree.exists(word):
+                self.tree.item(word, values=values)
+            else:
+                self.tree.insert("", tk.END, iid=word, text=word, values=values)
+
+        self.summary_var.set(f"Reconnects: {snapshot['reconnects']}    "
+                             f"Decode lines: {snapshot['decode_lines']} "
+                             f"({snapshot['decode_lines_per_second']:.1f}/s)")
+
+    def reset(self):
+        self.stats.reset()
+        self.tree.delete(*self.tree.get_children())
+
+    def export(self, kind):
+        path = filedialog.asksaveasfilename(parent=self, defaultextension=f".{kind}",
+                                            filetypes=[(kind.upper(), f"*.{kind}")])
+        if not path:
+            return
+        try:
+            if kind == "csv":
+                self.stats.export_csv(path)
+            else:
+                self.stats.export_json(path)
+        except OSError as e:
+            messagebox.showerror("Stats", f"Error exporting stats: {e}", parent=self)
+
+class ActivityWindow(RefreshingWindow):
+    REFRESH_INTERVAL = 5000  # ms
+    CELL_WIDTH = 10
+    CELL_HEIGHT = 18
+    LABEL_WIDTH = 150
+
+    def __init__(self, parent, activity, memories):
+        super().__init__(parent)
+        self.title("Band Activity")
+        self.activity = activity
+        self.memories = memories
+        self.show = tk.StringVar(value="band")
+        self.rows = []
+        self.cells = []
+
+        font_style = ("Helvetica", 14, "bold")
+        option_frame = tk.Frame(self)
+        option_frame.pack(fill=tk.X)
+        tk.Radiobutton(option_frame, text="Bands", variable=self.show, value="band", command=self.refresh, font=font_style).pack(side=tk.LEFT)
+        tk.Radiobutton(option_frame, text="Memories", variable=self.show, value="memory", command=self.refresh, font=font_style).pack(side=tk.LEFT)
+        tk.Label(option_frame, text=f"Last {activity.buckets * activity.bucket_seconds // 60} minutes, newest on the right").pack(side=tk.RIGHT)
+
+        self.canvas = tk.Canvas(self, background="black", highlightthickness=0)
+        self.canvas.pack(fill=tk.BOTH, expand=True)
+
+        self.refresh()
+
+    def row_keys(self):
+        if self.show.get() == "band":
+            return [(('band', band), band) for band in BAND_NAMES]
+        return [(('memory', memory['id']), f"{memory['text']} {memory['mode']}") for memory in self.memories()]
+
+    def build(self, rows):
+        # Items are created once per row set, refreshes only change their colours
+        self.canvas.delete("all")
+        self.rows = rows
+        self.cells = []
+        for row, (_, label) in enumerate(rows):
+            y = row * self.CELL_HEIGHT
+            self.canvas.create_text(4, y + self.CELL_HEIGHT // 2, text=label, anchor=tk.W, fill="white")
+            self.cells.append([self.canvas.create_rectangle(self.LABEL_WIDTH + column * self.CELL_WIDTH, y,
+                                                            self.LABEL_WIDTH + (column + 1) * self.CELL_WIDTH - 1,
+                                                            y + self.CELL_HEIGHT - 1, width=0)
+                               for column in range(self.activity.buckets)])
+        self.canvas.config(width=self.LABEL_WIDTH + self.activity.buckets * self.CELL_WIDTH,
+                           height=max(1, len(rows)) * self.CELL_HEIGHT)
+
+    def redraw(self):
+        rows = self.row_keys()
+        if rows != self.rows:
+            self.build(rows)
+
+        now = time.time()
+        histories = [self.activity.history(key, now) for key, _ in rows]
+        busiest = max((max(counts) for counts in histories), default=0) or 1
+        for cells, counts in zip(self.cells, histories):
+            for cell, count in zip(cells, counts):
+                self.canvas.itemconfig(cell, fill=self.heat_colour(count / busiest) if count else "#202020")
+
+    @staticmethod
+    def heat_colour(heat):
+        # Dark red through orange to yellow as activity rises
+        red = int(128 + 127 * min(1.0, heat * 2))
+        green = int(255 * max(0.0, heat * 2 - 1))
+        return f"#{red:02x}{green:02x}00"
+
+class WatchlistWindow(tk.Toplevel):
+    def __init__(self, parent, watchlist, on_save):
+        super().__init__(parent)
+        self.title("Watchlist")
+        self.on_save = on_save
+
+        font_style = ("Helvetica", 14, "bold")
+        tk.Label(self, text="One per line: call K1ABC, prefix VK9, grid FN42 or regex <pattern>",
+                 font=("Helvetica", 12)).pack(fill=tk.X)
+        self.entry_text = scrolledtext.ScrolledText(self, width=40, height=20, font=font_style)
+        self.entry_text.pack(expand=True, fill=tk.BOTH)
+        self.entry_text.insert(tk.END, "\n".join(watchlist.lines()))
+        tk.Button(self, text="Save", command=self.save, font=font_style).pack(pady=5)
+
+    def save(self):
+        entries, errors = parse_entries(self.entry_text.get(1.0, tk.END))
+        if errors:
+            messagebox.showerror("Watchlist", "\n".join(errors[:20]), parent=self)
+            return
+        self.on_save(entries)
+        self.destroy()
+
+class WatchAlertWindow(tk.Toplevel):
+    MAX_ALERTS = 200
+
+    def __init__(self, parent):
+        super().__init__(parent)
+        self.title("Watchlist Alerts")
+        self.listbox = tk.Listbox(self, font=("Helvetica", 12), width=80, height=12)
+        self.listbox.pack(expand=True, fill=tk.BOTH)
+        self.protocol("WM_DELETE_WINDOW", self.withdraw)
+
+    def alert(self, text):
+        self.listbox.insert(0, text)
+        if self.listbox.size() > self.MAX_ALERTS:
+            self.listbox.delete(self.MAX_ALERTS, tk.END)
+        self.deiconify()
+        self.lift()
+        self.bell()
+
 class TelnetGUI:
     def __init__(self, master):
         self.master = master
@@ -111,31 +533,89 @@ class TelnetGUI:
         self.available_font_sizes = [14, 16, 18, 20, 22, 24, 26, 28, 30]  # Add more sizes as needed
         self.current_font_size_index = 0
 
-        self.telnet_connection = None
-        self.telnet_host = "sbitx.local"
-        self.telnet_port = 8081
+        self.settings = {"history_enabled": False, "history_path": "sbmanager_history.db",
+                         "watchlist": [], "watch_popup": False, "watch_recall": False,
+                         "radios": [dict(DEFAULT_PROFILE)], "api_enabled": False, "api_port": DEFAULT_PORT}
+        self.load_settings()
 
-        self.command_buttons = []
+        # One connection, shadow state, command worker, parser and stats per sBITX
+        self.radios = RadioPool(self.settings["radios"])
+        self.selected_radio = tk.StringVar(value=self.radios.names()[0])
+        self.send_to_all = tk.BooleanVar(value=False)
+        self.message_windows = {}
+
+        # Memories by stable ID, the listbox shows the filtered view through memory_view
+        self.memory_bank = MemoryBank()
+        self.store = MemoryStore("sbmanager_config.json")
+        self.view_band = tk.StringVar(value="")
+        self.view_mode = tk.StringVar(value="")
 
-        self.scan_running = False
-        self.scan_thread = None
         self.scan_wait_time = 5  # Default wait time between commands in seconds
+        self.scanner = ScanScheduler(self.scan_recall, default_dwell=self.scan_wait_time)
+        self.scan_hold = tk.BooleanVar(value=False)
+        self.scan_targets = []
+        self.scan_options = (False, True)
+        # Radios whose link is down, the scan waits while any of its targets is
+        self.lost_radios = set()
+        # (event, radio, connection, results) from the connection threads, handled in check_responses
+        self.link_events = queue.Queue()
+
+        # Send all recall commands in one write instead of one round-trip per command
+        self.pipelined_recall = tk.BooleanVar(value=True)
+
+        # Recalls only send the settings that differ from each radio's shadow state
+        self.delta_recall = tk.BooleanVar(value=True)
+
+        self.status_var = tk.StringVar(value="Not connected")
+
+        # Structured records of everything decoded on any radio, searchable by callsign, grid and band
+        self.decode_index = DecodeIndex()
+
+        # Rolling decode counts per memory and band, for the heatmap and weighted scanning
+        self.activity = ActivityModel()
+        self.scanner.activity = self.activity
+        self.scan_weighted = tk.BooleanVar(value=False)
+
+        # Decode lines are checked against the watchlist as they arrive
+        entries, errors = parse_entries("\n".join(self.settings["watchlist"]))
+        for error in errors:
+            print(f"Watchlist {error}")
+        self.watchlist = Watchlist(entries)
+        self.watch_popup = tk.BooleanVar(value=self.settings["watch_popup"])
+        self.watch_recall = tk.BooleanVar(value=self.settings["watch_recall"])
+        self.alert_window = None
+
+        self.history = None
+        self.history_enabled = tk.BooleanVar(value=self.settings["history_enabled"])
+        if self.history_enabled.get():
+            self.history = self.open_history()
+
+        # Local JSON-lines API so scripts and other screens share this session's telnet link
+        self.api = None
+        self.api_requests = queue.Queue()
+        self.api_enabled = tk.BooleanVar(value=self.settings["api_enabled"])
 
         self.load_button_config()
 
-        self.message_window = MessageWindow(master)
-        self.message_window.withdraw()
-
-        threading.Thread(target=self.check_responses).start()
-
         menubar = tk.Menu(master, font=("Helvetica", 14, "bold"))
         master.config(menu=menubar)
+        master.protocol("WM_DELETE_WINDOW", self.exit_application)
 
         telnet_menu = tk.Menu(menubar, tearoff=0, font=("Helvetica", 14, "bold"))
         menubar.add_cascade(label="Main", menu=telnet_menu)
 
         telnet_menu.add_command(label="Open Telnet", command=self.open_telnet)
+        telnet_menu.add_command(label="Open All Radios", command=self.open_all_radios)
         telnet_menu.add_command(label="Close Telnet", command=self.close_telnet)
+        telnet_menu.add_checkbutton(label="Pipelined Recall", variable=self.pipelined_recall)
+        telnet_menu.add_checkbutton(label="Delta Recall", variable=self.delta_recall)
+        telnet_menu.add_command(label="Force Full Resync", command=self.force_full_resync)
+        telnet_menu.add_checkbutton(label="Control API", variable=self.api_enabled, command=self.toggle_api)
+        telnet_menu.add_separator()
+        telnet_menu.add_command(label="Record Session", command=self.start_recording)
+        telnet_menu.add_command(label="Stop Recording", command=self.stop_recording)
+        telnet_menu.add_command(label="Replay Capture", command=lambda: self.replay_capture(1.0))
+        telnet_menu.add_command(label="Replay Capture (Fast)", command=lambda: self.replay_capture(0))
         telnet_menu.add_separator()
         telnet_menu.add_command(label="Larger Text", command=self.increase_font_size)
         telnet_menu.add_command(label="About", command=self.show_about_dialog)
@@ -149,6 +629,13 @@ class TelnetGUI:
         frequency_submenu.add_command(label="Add", command=self.add_command_submenu)
         frequency_submenu.add_command(label="Edit", command=self.edit_command_submenu)
         frequency_submenu.add_command(label="Remove", command=self.remove_command_submenu)
+        frequency_submenu.add_command(label="Nearest Memory", command=self.recall_nearest_memory)
+        frequency_submenu.add_command(label="Import Memories", command=self.import_memories)
+        export_submenu = tk.Menu(frequency_submenu, tearoff=0, font=("Helvetica", 14, "bold"))
+        frequency_submenu.add_cascade(label="Export Memories", menu=export_submenu)
+        export_submenu.add_command(label="CSV", command=lambda: self.export_memories("csv"))
+        export_submenu.add_command(label="CHIRP CSV", command=lambda: self.export_memories("chirp"))
+        export_submenu.add_command(label="ADIF", command=lambda: self.export_memories("adif"))
 
         command_menu.add_command(label="IF Level", command=lambda: self.show_input_dialog("IF"))
         command_menu.add_command(label="Bandwidth", command=lambda: self.show_input_dialog("Bandwidth"))
@@ -157,6 +644,16 @@ class TelnetGUI:
         command_menu.add_command(label="TX Compressor", command=lambda: self.show_input_dialog("Comp Lvl"))
         command_menu.add_command(label="Clear sBitx Messages", command=lambda: self.send_command("clear"))
         command_menu.add_command(label="Decode Messages", command=self.open_response_box)
+        command_menu.add_command(label="Search Decodes", command=self.search_decodes)
+        command_menu.add_command(label="Decode History", command=self.open_history_window)
+        command_menu.add_command(label="Stats", command=self.open_stats_window)
+        watch_submenu = tk.Menu(command_menu, tearoff=0, font=("Helvetica", 14, "bold"))
+        command_menu.add_cascade(label="Watchlist", menu=watch_submenu)
+        watch_submenu.add_command(label="Edit Watchlist", command=self.open_watchlist_window)
+        watch_submenu.add_command(label="Show Alerts", command=self.show_alert_window)
+        watch_submenu.add_checkbutton(label="Popup Alerts", variable=self.watch_popup, command=self.toggle_watch_options)
+        watch_submenu.add_checkbutton(label="Recall Memory on Alert", variable=self.watch_recall, command=self.toggle_watch_options)
+        command_menu.add_checkbutton(label="Record Decode History", variable=self.history_enabled, command=self.toggle_history)
         command_menu.add_command(label="Open sBitx Web", command=self.open_web_browser)
 
         vfo_submenu = tk.Menu(command_menu, tearoff=0, font=("Helvetica", 14, "bold"))
@@ -208,13 +705,36 @@ class TelnetGUI:
         command_menu.add_command(label="Digital", command=lambda: self.send_command("m digital"))
         command_menu.add_command(label="2Tone", command=lambda: self.send_command("m 2tone"))
 
+        view_menu = tk.Menu(menubar, tearoff=0, font=("Helvetica", 14, "bold"))
+        menubar.add_cascade(label="View", menu=view_menu)
+        band_submenu = tk.Menu(view_menu, tearoff=0, font=("Helvetica", 14, "bold"))
+        view_menu.add_cascade(label="Band", menu=band_submenu)
+        band_submenu.add_radiobutton(label="All", variable=self.view_band, value="", command=self.update_main_screen)
+        for band in BAND_NAMES:
+            band_submenu.add_radiobutton(label=band, variable=self.view_band, value=band, command=self.update_main_screen)
+        mode_submenu = tk.Menu(view_menu, tearoff=0, font=("Helvetica", 14, "bold"))
+        view_menu.add_cascade(label="Mode", menu=mode_submenu)
+        mode_submenu.add_radiobutton(label="All", variable=self.view_mode, value="", command=self.update_main_screen)
+        for mode in MODE_OPTIONS:
+            mode_submenu.add_radiobutton(label=mode, variable=self.view_mode, value=mode, command=self.update_main_screen)
+        view_menu.add_command(label="Band Activity", command=self.open_activity_window)
+
+        self.radio_menu = tk.Menu(menubar, tearoff=0, font=("Helvetica", 14, "bold"))
+        menubar.add_cascade(label="Radio", menu=self.radio_menu)
+        self.build_radio_menu()
+
         scan_menu = tk.Menu(menubar, tearoff=0, font=("Helvetica", 14, "bold"))
         menubar.add_cascade(label="Scan", menu=scan_menu)
         scan_menu.add_command(label="Start Scan", command=self.start_scan)
         scan_menu.add_command(label="Stop Scan", command=self.stop_scan)
         scan_menu.add_separator()
         scan_menu.add_command(label="Set Scan Wait Time", command=self.set_scan_wait_time)
+        scan_menu.add_checkbutton(label="Hold While Decoding", variable=self.scan_hold, command=self.toggle_scan_hold)
+        scan_menu.add_checkbutton(label="Activity Weighted", variable=self.scan_weighted, command=self.toggle_scan_weighted)
         
+        status_label = tk.Label(self.master, textvariable=self.status_var, anchor=tk.W, font=("Helvetica", 12))
+        status_label.pack(side=tk.BOTTOM, fill=tk.X)
+
         self.listbox = tk.Listbox(self.master, selectmode=tk.SINGLE, font=("Helvetica", self.available_font_sizes[self.current_font_size_index], "bold"))
         self.listbox.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
         self.listbox.config(width=39, height=30)  # Adjust the value according to your needs
@@ -222,44 +742,432 @@ class TelnetGUI:
         self.scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
         self.listbox.config(yscrollcommand=self.scrollbar.set)
         self.listbox.bind("<ButtonRelease-1>", self.on_listbox_click)
+        self.memory_view = MemoryListView(self.listbox, self.format_memory, key=self.memory_bank.position,
+                                          match=self.memory_visible)
         self.update_main_screen()
+        self.select_radio()
+        if self.api_enabled.get():
+            self.start_api()
+
+        self.check_responses()
+
+    @property
+    def radio(self):
+        # The radio picked in the Radio menu, single commands and windows go to it
+        return self.radios.get(self.selected_radio.get())
+
+    def target_radios(self):
+        # Where commands and recalls go, every open radio in Send to All mode
+        if self.send_to_all.get():
+            return self.radios.connected()
+        radio = self.radio
+        return [radio] if radio.connection else []
+
+    def build_radio_menu(self):
+        self.radio_menu.delete(0, tk.END)
+        for name in self.radios.names():
+            self.radio_menu.add_radiobutton(label=name, variable=self.selected_radio, value=name, command=self.select_radio)
+        self.radio_menu.add_separator()
+        self.radio_menu.add_checkbutton(label="Send to All Radios", variable=self.send_to_all)
+        self.radio_menu.add_command(label="Add Radio", command=self.add_radio)
+        self.radio_menu.add_command(label="Remove Radio", command=self.remove_radio)
+
+    def select_radio(self):
+        if len(self.radios) > 1:
+            self.master.title(f"sBITX Manager - {self.radio.name}")
+        else:
+            self.master.title("sBITX Manager")
+
+    def add_radio(self):
+        name = simpledialog.askstring("Add Radio", "Name:")
+        if not name:
+            return
+        host = simpledialog.askstring("Add Radio", "Host name or address:", initialvalue="sbitx.local")
+        if not host:
+            return
+        port = simpledialog.askinteger("Add Radio", "Telnet port:", initialvalue=8081, minvalue=1, maxvalue=65535)
+        if not port:
+            return
+        try:
+            self.radios.add({"name": name.strip(), "host": host.strip(), "port": port})
+        except ValueError as e:
+            messagebox.showerror("Add Radio", str(e))
+            return
+        self.settings["radios"] = self.radios.profiles()
+        self.save_settings()
+        self.build_radio_menu()
+
+    def remove_radio(self):
+        radio = self.radio
+        if len(self.radios) == 1:
+            messagebox.showinfo("Remove Radio", "The last radio can not be removed.")
+            return
+        if not messagebox.askyesno("Remove Radio", f"Remove {radio.name}?"):
+            return
+        self.radios.remove(radio.name)
+        if radio.name in self.lost_radios:
+            self.lost_radios.discard(radio.name)
+            self.update_scan_hold()
+        window = self.message_windows.pop(radio.name, None)
+        if window:
+            window.destroy()
+        self.settings["radios"] = self.radios.profiles()
+        self.save_settings()
+        self.selected_radio.set(self.radios.names()[0])
+        self.build_radio_menu()
+        self.select_radio()
+
+    def message_window(self, radio):
+        window = self.message_windows.get(radio.name)
+        if window is None:
+            window = self.message_windows[radio.name] = MessageWindow(self.master)
+            window.title(f"Decoded Messages - {radio.name}")
+            window.withdraw()
+        return window
 
     def check_responses(self):
-        try:
-            while True:
-                if self.telnet_connection:
-                    response = self.telnet_connection.read_until(b'>', timeout=0.1).decode('ascii')
-                    if response:
-                        # Append response to the message window
-                        self.message_window.append_response(response)
+        # Drain decoded lines from every radio's connection reader on the Tk thread
+        for radio in self.radios.connected():
+            self.drain_messages(radio)
+
+        # Link drops and recoveries reported by the supervisors
+        while True:
+            try:
+                event, radio, connection, results = self.link_events.get_nowait()
+            except queue.Empty:
+                break
+            if radio.connection is connection:
+                if event == "lost":
+                    self.on_connection_lost(radio)
                 else:
-                    # Telnet connection is closed, break the loop
-                    break
+                    self.on_connection_restored(radio, results)
+
+        # Control API requests are carried out here so they see the same state as the menus
+        for _ in range(50):
+            try:
+                op, request, future = self.api_requests.get_nowait()
+            except queue.Empty:
+                break
+            self.run_api_request(op, request, future)
+
+        # Command status from the executor thread is only shown from here, on the Tk thread
+        radio = self.radio
+        connection = radio.connection
+        if not connection:
+            status = "Not connected"
+        elif connection.status != "Connected":
+            held = radio.executor.pending()
+            status = f"{connection.status}, {held} commands held" if held else connection.status
+        else:
+            status = radio.executor.status
+        if len(self.radios) > 1:
+            status = f"{radio.name}: {status}" + ("  [Send to All]" if self.send_to_all.get() else "")
+        if self.status_var.get() != status:
+            self.status_var.set(status)
+
+        self.master.after(100, self.check_responses)
+
+    def drain_messages(self, radio):
+        window = self.message_window(radio)
+        lines = 0
+        published = []
+        for _ in range(500):
+            try:
+                response = radio.connection.messages.get_nowait()
+            except queue.Empty:
+                break
+            lines += 1
+            hits = self.watchlist.scan(response) if self.watchlist.active else None
+            window.append_response(response, "watch" if hits else None)
+            if hits:
+                self.on_watch_hit(radio, response, hits)
+            records = radio.parser.feed(response)
+            self.decode_index.extend(records)
+            if records:
+                if radio.name in self.scan_targets:
+                    self.scanner.note_activity()
+                self.activity.record(radio.current_memory_id, radio.parser.band, len(records))
+            if self.history:
+                self.history.extend(records)
+            published.extend(records)
+        if lines:
+            radio.stats.record_decodes(lines)
+        if self.api and published:
+            self.api.publish(radio.name, published)
+
+    def toggle_api(self):
+        if self.api_enabled.get():
+            self.start_api()
+        elif self.api:
+            self.api.stop()
+            self.api = None
+        self.settings["api_enabled"] = self.api_enabled.get()
+        self.save_settings()
+
+    def start_api(self):
+        if self.api:
+            return
+        self.api = ControlServer(self.api_request, port=self.settings["api_port"])
+        try:
+            self.api.start().result(timeout=5)
+        except Exception as e:
+            self.api.stop()
+            self.api = None
+            self.api_enabled.set(False)
+            messagebox.showerror("Control API", f"Failed to listen on port {self.settings['api_port']}: {e}")
+
+    def api_request(self, op, request):
+        # API thread. Handed to the Tk thread, the future completes once the radio has answered
+        future = Future()
+        self.api_requests.put((op, request, future))
+        return future
+
+    def api_radios(self, request):
+        if request.get("radio"):
+            radio = self.radios.get(request["radio"])
+            if radio is None:
+                raise RequestError(f"no radio named '{request['radio']}'")
+            return [radio]
+        return self.target_radios()
+
+    def run_api_request(self, op, request, future):
+        try:
+            radios = self.api_radios(request)
+            if op == "state":
+                future.set_result({radio.name: radio_status(radio, self.memory_bank)
+                                   for radio in (radios or [self.radio])})
+                return
+            if op == "memories":
+                future.set_result([dict(memory) for memory in self.memory_bank.memories])
+                return
+            radios = [radio for radio in radios if radio.connection]
+            if not radios:
+                raise RequestError("not connected to the sBITX")
+
+            if op == "recall":
+                memory = self.memory_bank.find(request.get("memory", ""))
+                if memory is None:
+                    raise RequestError(f"no memory '{request.get('memory', '')}'")
+                fanned = self.send_freq_command(memory['id'], radios)
+            else:
+                command = str(request.get("command", "")).strip()
+                if not command:
+                    raise RequestError("no command")
+                fanned = self.submit_command(command, radios)
+            fan_out_result(fanned, future)
         except Exception as e:
-            print(f"Error in response polling: {e}")
+            future.set_exception(e)
+
+    def open_history(self):
+        # None if the database can't be opened, the menu check is cleared again
+        try:
+            return DecodeHistory(self.settings["history_path"])
+        except (sqlite3.Error, OSError) as e:
+            messagebox.showerror("Decode History", f"Could not open {self.settings['history_path']}: {e}")
+            self.history_enabled.set(False)
+            return None
+
+    def toggle_history(self):
+        if self.history_enabled.get() and not self.history:
+            self.history = self.open_history()
+        elif not self.history_enabled.get() and self.history:
+            self.history.close()
+            self.history = None
+
+        self.settings["history_enabled"] = self.history_enabled.get()
+        self.save_settings()
+
+    def open_history_window(self):
+        if not self.history:
+            messagebox.showinfo("Decode History", "Enable 'Record Decode History' in the Command menu first.")
+            return
+        HistoryWindow(self.master, self.history)
+
+    def on_watch_hit(self, radio, response, hits):
+        memory = self.memory_bank.get(radio.current_memory_id)
+        where = f"{memory['text']} {memory['mode']}" if memory else "?"
+        if len(self.radios) > 1:
+            where = f"{radio.name} {where}"
+        matched = ", ".join(f"{text} ({entry})" for entry, text in hits)
+        alert = f"{time.strftime('%H:%M:%S')}  {where}  {matched}:  {response.translate(MessageWindow.STRIP_CHARS).strip()}"
+
+        if self.watch_popup.get():
+            self.show_alert_window()
+            self.alert_window.alert(alert)
+        if self.watch_recall.get() and memory is not None and self.scanner.running and radio.name in self.scan_targets:
+            # Stop on the memory the hit came from instead of scanning past it
+            self.scanner.stop()
+            self.send_freq_command(memory['id'], self.radios_named(self.scan_targets))
+
+    def show_alert_window(self):
+        if self.alert_window is None:
+            self.alert_window = WatchAlertWindow(self.master)
+        self.alert_window.deiconify()
+
+    def open_watchlist_window(self):
+        WatchlistWindow(self.master, self.watchlist, self.save_watchlist)
+
+    def save_watchlist(self, entries):
+        self.watchlist.set_entries(entries)
+        self.settings["watchlist"] = self.watchlist.lines()
+        self.save_settings()
+
+    def toggle_watch_options(self):
+        self.settings["watch_popup"] = self.watch_popup.get()
+        self.settings["watch_recall"] = self.watch_recall.get()
+        self.save_settings()
+
+    def open_stats_window(self):
+        StatsWindow(self.master, self.radio.stats, self.radio.name if len(self.radios) > 1 else "")
+
+    def search_decodes(self):
+        query = simpledialog.askstring("Search Decodes", "Callsign or grid (e.g. K1ABC, FN or FN42):")
+        if not query:
+            return
+        query = query.strip().upper()
+
+        since = time.time() - 3600
+        if GRID.match(query) or (len(query) == 2 and query.isalpha()):
+            records = self.decode_index.in_grid(query, since=since)
+        else:
+            records = self.decode_index.heard(query, since=since)
+
+        if not records:
+            messagebox.showinfo("Search Decodes", f"{query} not heard in the last hour.")
+            return
+
+        lines = []
+        for record in records[-20:]:
+            heard_at = time.strftime("%H:%M:%S", time.localtime(record.timestamp))
+            snr = f"{record.snr:+d} dB " if record.snr is not None else ""
+            lines.append(f"{heard_at} {record.band or ''} {snr}{record.text}")
+        messagebox.showinfo("Search Decodes", f"{len(records)} decodes in the last hour:\n\n" + "\n".join(lines))
+
+    def watch_future(self, future, callback):
+        # Run callback on the Tk thread once a connection future completes
+        if future.done():
+            callback(future)
+        else:
+            self.master.after(20, self.watch_future, future, callback)
 
     def open_response_box(self):
-        self.message_window.deiconify()
+        self.message_window(self.radio).deiconify()
 
     def open_telnet(self):
+        self.open_radio(self.radio)
+
+    def open_all_radios(self):
+        # Connect to every radio at once, each on its own connection thread
+        for radio in self.radios:
+            self.open_radio(radio, quiet=True)
+
+    def open_radio(self, radio, quiet=False):
+        if not radio.connection:
+            connection = RadioConnection(radio.host, radio.port, stats=radio.stats, capture=radio.capture)
+            self.watch_future(connection.connect(), lambda future: self.on_telnet_opened(radio, connection, future, quiet))
+
+    def on_telnet_opened(self, radio, connection, future, quiet=False):
+        if future.exception() is not None:
+            connection.stop()
+            messagebox.showerror("Telnet Error", f"Invalid response from {radio.name}. The SBITX transceiver should be restarted.")
+            return
+        if radio.name not in self.radios.names():
+            # Removed while connecting
+            connection.stop()
+            return
+
+        radio.connection = connection
+        # Nothing is known about a radio we just connected to
+        radio.state.invalidate()
+        # The callbacks run on the connection's loop thread, the Tk thread picks the events up
+        connection.supervise(replay=radio.state.replay_commands,
+                             on_lost=lambda: self.link_events.put(("lost", radio, connection, None)),
+                             on_restored=lambda results: self.link_events.put(("restored", radio, connection, results)))
+        if not quiet:
+            messagebox.showinfo("Telnet", f"Telnet connection to {radio.name} opened successfully.")
+
+    def start_recording(self):
+        radio = self.radio
+        if radio.capture:
+            messagebox.showinfo("Record Session", f"Already recording {radio.name} to {radio.capture.path}")
+            return
+        path = filedialog.asksaveasfilename(title="Record Session", defaultextension=".sbxcap",
+                                            filetypes=[("Session captures", "*.sbxcap"), ("All files", "*")])
+        if not path:
+            return
         try:
-            if not self.telnet_connection:
-                self.telnet_connection = telnetlib.Telnet(self.telnet_host, self.telnet_port)
-                response = self.telnet_connection.read_until(b'>', timeout=1).decode('ascii')
-                messagebox.showinfo("Telnet", "Telnet connection opened successfully.")
-
-                # Start the response polling thread after opening the telnet connection
-                threading.Thread(target=self.check_responses).start()
-
-        except socket.error as e:
-            messagebox.showerror("Telnet Error", "Invalid response. The SBITX transceiver should be restarted.")
+            radio.capture = CaptureWriter(path)
+        except OSError as e:
+            messagebox.showerror("Record Session", f"Failed to create {path}: {e}")
+            return
+        if radio.connection:
+            radio.connection.capture = radio.capture
+
+    def stop_recording(self):
+        radio = self.radio
+        capture = radio.capture
+        if not capture:
+            return
+        radio.capture = None
+        if radio.connection:
+            radio.connection.capture = None
+        capture.close()
+        messagebox.showinfo("Record Session", f"Recorded {capture.records} records to {capture.path}")
+
+    def replay_capture(self, speed):
+        # Played into the selected radio's decode window, parser, watchlist and stats as if it were live
+        radio = self.radio
+        if radio.connection:
+            messagebox.showerror("Replay Capture", f"Close the connection to {radio.name} first.")
+            return
+        path = filedialog.askopenfilename(title="Replay Capture",
+                                          filetypes=[("Session captures", "*.sbxcap"), ("All files", "*")])
+        if not path:
+            return
+        connection = ReplayConnection(path, speed=speed, stats=radio.stats)
+        self.watch_future(connection.connect(), lambda future: self.on_replay_opened(radio, connection, future))
+
+    def on_replay_opened(self, radio, connection, future):
+        if future.exception() is not None:
+            connection.stop()
+            messagebox.showerror("Replay Capture", f"Failed to replay {connection.path}: {future.exception()}")
+            return
+        radio.connection = connection
+        radio.state.invalidate()
+        self.message_window(radio).deiconify()
+
+    def on_connection_lost(self, radio):
+        # Hold commands and the scan until the radio is back
+        radio.executor.pause()
+        self.lost_radios.add(radio.name)
+        self.update_scan_hold()
+
+    def on_connection_restored(self, radio, results):
+        # The last known settings have been sent again, carry on
+        radio.state.apply_results(results)
+        radio.executor.resume()
+        self.lost_radios.discard(radio.name)
+        self.update_scan_hold()
+
+    def update_scan_hold(self):
+        # Paused while any radio being scanned is reconnecting
+        if any(name in self.lost_radios for name in self.scan_targets):
+            self.scanner.pause()
+        else:
+            self.scanner.resume()
 
     def close_telnet(self):
+        radio = self.radio
         try:
-            if self.telnet_connection:
-                self.telnet_connection.close()
-                self.telnet_connection = None
-                messagebox.showinfo("Telnet", "Telnet connection closed successfully.")
+            if radio.connection:
+                connection = radio.connection
+                radio.connection = None
+                connection.stop()
+                radio.executor.resume()
+                self.lost_radios.discard(radio.name)
+                if radio.name in self.scan_targets:
+                    self.update_scan_hold()
+                messagebox.showinfo("Telnet", f"Telnet connection to {radio.name} closed successfully.")
             else:
                 messagebox.showinfo("Telnet", "No Telnet connection to close.")
         except Exception as e:
@@ -287,12 +1195,37 @@ class TelnetGUI:
         about_label.config(font=("TkDefaultFont", 11, "bold"))  # Adjust the font size as needed
         about_label.pack()
 
+    def force_full_resync(self):
+        # Forget the shadow state and send every setting of the current memory again
+        for radio in self.target_radios():
+            radio.state.invalidate()
+            if radio.current_memory_id is not None:
+                self.send_freq_command(radio.current_memory_id, [radio])
+
     def on_listbox_click(self, event):
         selected_index = self.listbox.nearest(event.y)
 
-        if selected_index >= 0 and selected_index < len(self.command_buttons):
-            selected_command = self.command_buttons[selected_index]['text']
-            self.send_freq_command(selected_command)
+        memory_id = self.memory_view.memory_id(selected_index)
+        if memory_id is not None:
+            self.send_freq_command(memory_id)
+
+    def recall_nearest_memory(self):
+        # Start from the frequency the radio was last tuned to, recalled or typed in
+        current = self.radio.state.get('f')
+        if current is None:
+            memory = self.memory_bank.get(self.radio.current_memory_id)
+            current = memory['text'] if memory else ""
+        user_input = simpledialog.askstring("Nearest Memory", "Frequency (kHz or Hz):", initialvalue=current)
+        if not user_input:
+            return
+
+        memory = self.memory_bank.nearest(user_input)
+        if memory is None:
+            messagebox.showinfo("Nearest Memory", "No memory found near that frequency.")
+            return
+
+        self.memory_view.select(memory['id'])
+        self.send_freq_command(memory['id'])
 
     def show_input_dialog(self, command):
         user_input = simpledialog.askstring(f"Enter {command} Command", f"Enter the {command} command:")
@@ -311,40 +1244,46 @@ class TelnetGUI:
         self.send_command(user_input)
 
     def send_command(self, command):
-        try:
-            if self.telnet_connection:
-                self.telnet_connection.write(command.encode('ascii') + b'\r\n')
-                response = self.telnet_connection.read_until(b'>', timeout=0.1).decode('ascii')
-                print(f"Command '{command}' response: {response}")
-        except socket.error as e:
-            messagebox.showerror("Error", f"Failed to send command '{command}': {e}")
-
-    def send_freq_command(self, command):
-        try:
-            if self.telnet_connection:
-                button_info = next(info for info in self.command_buttons if info['text'] == command)
-                frequency = button_info['text']
-                mode = button_info['mode']
-                bandwidth = button_info['bandwidth']
-                if_setting = button_info.get('if_setting', '')
-                agc_setting = button_info.get('agc_setting', '')
-
-                commands = [
-                    f'f {frequency}',
-                    f'm {mode}',
-                    f'bw {bandwidth}',
-                    f'if {if_setting}',
-                    f'agc {agc_setting}',
-                    'clear'
-                ]
-
-                for cmd in commands:
-                    self.telnet_connection.write(cmd.encode('ascii') + b'\r\n')
-                    response = self.telnet_connection.read_until(b'>', timeout=0.1).decode('ascii')
-                    print(f"Command '{cmd}' response: {response}")
-
-        except Exception as e:
-            print(f"Error: {e}")
+        radios = self.target_radios()
+        if radios and command:
+            future = self.submit_command(command, radios)
+            self.watch_future(future, lambda future: self.on_command_sent(command, future))
+            return future
+
+    def submit_command(self, command, radios):
+        # Each radio has its own worker, so in Send to All mode they all run at once
+        return self.radios.fan_out(radios, lambda radio: radio.send(command))
+
+    def on_command_sent(self, command, future):
+        errors = self.command_errors(future)
+        if errors:
+            messagebox.showerror("Error", f"Failed to send command '{command}':\n" + "\n".join(errors))
+
+    def command_errors(self, future):
+        # The shadow state was already updated by each radio, see Radio.report_command
+        errors = []
+        for name, radio_future in future.result().items():
+            if radio_future.cancelled() or radio_future.exception() is None:
+                continue
+            errors.append(f"{name}: {radio_future.exception()}" if len(self.radios) > 1 else str(radio_future.exception()))
+        return errors
+
+    def radios_named(self, names):
+        return [radio for radio in map(self.radios.get, names) if radio is not None and radio.connection]
+
+    def recall_options(self):
+        # Tk thread only, the workers get these as plain values
+        return not self.delta_recall.get(), self.pipelined_recall.get()
+
+    def send_freq_command(self, memory_id, radios=None, options=None):
+        # A newer recall replaces one that is still waiting to be sent, per radio.
+        # Callers off the Tk thread pass radios and options read on the Tk thread
+        button_info = self.memory_bank.get(memory_id)
+        radios = self.target_radios() if radios is None else radios
+        full, pipelined = self.recall_options() if options is None else options
+        if radios and button_info is not None:
+            return self.radios.fan_out(radios, lambda radio: radio.recall(button_info, full, pipelined))
+        return None
 
     def add_command_submenu(self):
         dialog = FrequencyInputDialog(self.master, "Add Frequency")
@@ -356,24 +1295,28 @@ class TelnetGUI:
         new_bandwidth = dialog.bw_var.get()
         new_if_setting = dialog.if_var.get()
         new_agc_setting = dialog.agc_var.get()
+        new_dwell = dialog.dwell_var.get().strip()
+        new_priority = dialog.priority_var.get()
 
+        if new_frequency and frequency_hz(new_frequency) is None:
+            messagebox.showerror("Add Frequency", f"'{new_frequency}' is not a frequency in kHz or Hz.")
+            return
         if new_frequency and new_mode and new_bandwidth:
             button_info = {'text': new_frequency, 'mode': new_mode, 'bandwidth': new_bandwidth,
-                           'if_setting': new_if_setting, 'agc_setting': new_agc_setting}
+                           'if_setting': new_if_setting, 'agc_setting': new_agc_setting,
+                           'dwell': new_dwell, 'priority': new_priority}
 
-            item_text = f"{button_info['text']} | M: {button_info['mode']} | BW: {button_info['bandwidth']} | IF: {button_info['if_setting']} | A: {button_info['agc_setting']}"
-            self.listbox.insert(tk.END, item_text)
+            self.memory_bank.add(button_info)
+            self.record_change({'op': 'add', 'memory': button_info})
 
-            self.command_buttons.append(button_info)
-            self.save_button_config()
-
-            self.update_main_screen()	
+            self.memory_view.insert(button_info)
 
     def edit_command_submenu(self):
         selected_index = self.listbox.curselection()
         if selected_index:
             selected_index = int(selected_index[0])
-            selected_info = self.command_buttons[selected_index]
+            memory_id = self.memory_view.memory_id(selected_index)
+            selected_info = self.memory_bank.get(memory_id)
 
             dialog = FrequencyInputDialog(self.master, "Edit Frequency", initial_values=selected_info)
 
@@ -384,24 +1327,62 @@ class TelnetGUI:
             edited_bandwidth = dialog.bw_var.get()
             edited_if_setting = dialog.if_var.get()
             edited_agc_setting = dialog.agc_var.get()
+            edited_dwell = dialog.dwell_var.get().strip()
+            edited_priority = dialog.priority_var.get()
 
+            if edited_frequency and frequency_hz(edited_frequency) is None:
+                messagebox.showerror("Edit Frequency", f"'{edited_frequency}' is not a frequency in kHz or Hz.")
+                return
             if edited_frequency and edited_mode and edited_bandwidth:
-                selected_info['text'] = edited_frequency
-                selected_info['mode'] = edited_mode
-                selected_info['bandwidth'] = edited_bandwidth
-                selected_info['if_setting'] = edited_if_setting
-                selected_info['agc_setting'] = edited_agc_setting
+                self.memory_bank.update(memory_id, {'text': edited_frequency, 'mode': edited_mode,
+                                                    'bandwidth': edited_bandwidth, 'if_setting': edited_if_setting,
+                                                    'agc_setting': edited_agc_setting, 'dwell': edited_dwell,
+                                                    'priority': edited_priority})
+                self.record_change({'op': 'update', 'memory': selected_info})
+
+                self.memory_view.replace(selected_info)
+
+    def import_memories(self):
+        path = filedialog.askopenfilename(title="Import Memories",
+                                          filetypes=[("Memory lists", "*.csv *.adi *.adif"), ("All files", "*")])
+        if not path:
+            return
+        if self.store.is_stale():
+            # Import into what is on disk, so the single save below does not conflict
+            self.load_button_config()
 
-                self.update_main_screen()
-                self.save_button_config()
+        try:
+            result = import_memories(path, self.memory_bank)
+        except (OSError, UnicodeDecodeError, csv.Error) as e:
+            messagebox.showerror("Import Memories", f"Failed to read {path}: {e}")
+            return
+
+        if result.memories:
+            self.memory_bank.extend(result.memories)
+            self.save_button_config()
+            self.update_main_screen()
+        messagebox.showinfo("Import Memories", result.summary())
+
+    def export_memories(self, fmt):
+        extension = ".adi" if fmt == "adif" else ".csv"
+        path = filedialog.asksaveasfilename(title="Export Memories", defaultextension=extension,
+                                            filetypes=[(fmt.upper(), f"*{extension}")])
+        if not path:
+            return
+        try:
+            export_memories(path, self.visible_memories(), fmt)
+        except OSError as e:
+            messagebox.showerror("Export Memories", f"Failed to write {path}: {e}")
 
     def remove_command_submenu(self):
         selected_index = self.listbox.curselection()
         if selected_index:
             selected_index = int(selected_index[0])
-            self.listbox.delete(selected_index)
-            removed_info = self.command_buttons.pop(selected_index)
-            self.save_button_config()
+            memory_id = self.memory_view.memory_id(selected_index)
+            self.memory_view.delete(memory_id)
+            removed_info = self.memory_bank.remove(memory_id)
+            self.activity.forget(memory_id)
+            self.record_change({'op': 'remove', 'id': removed_info['id']})
 
             print(f"Removed: {removed_info}")
 
@@ -411,70 +1392,130 @@ class TelnetGUI:
         context_menu.add_command(label="Remove", command=lambda info=button_info: self.remove_command(info))
         context_menu.post(event.x_root, event.y_root)
 
-    def update_main_screen(self):
-        self.listbox.delete(0, tk.END)
+    def visible_memories(self):
+        return self.memory_bank.filter(band=self.view_band.get(), mode=self.view_mode.get())
+
+    def memory_visible(self, button_info):
+        return MemoryBank.matches(button_info, band=self.view_band.get(), mode=self.view_mode.get())
 
-        for button_info in self.command_buttons:
-            item_text = f" {button_info['text']} | {button_info['mode']} | BW: {button_info['bandwidth']} | IF: {button_info['if_setting']} | AGC: {button_info['agc_setting']}"
-            self.listbox.insert(tk.END, item_text)
+    def format_memory(self, button_info):
+        item_text = f" {button_info['text']} | {button_info['mode']} | BW: {button_info['bandwidth']} | IF: {button_info['if_setting']} | AGC: {button_info['agc_setting']}"
+        if button_info.get('dwell'):
+            item_text += f" | D: {button_info['dwell']}s"
+        if button_info.get('priority'):
+            item_text += " | P"
+        return item_text
+
+    def update_main_screen(self):
+        # Full rebuild, single edits go through memory_view instead
+        self.memory_view.set_rows(self.visible_memories())
 
     def increase_font_size(self):
         self.current_font_size_index = (self.current_font_size_index + 1) % len(self.available_font_sizes)
         self.listbox.config(font=("Helvetica", self.available_font_sizes[self.current_font_size_index], "bold"))
 		
     def start_scan(self):
-        if not self.scan_running:
-            self.scan_running = True
-            self.scan_thread = threading.Thread(target=self.scan_commands)
-            self.scan_thread.start()
+        if not self.scanner.running:
+            # Scan what the current view shows on the radios in use now, read on the Tk thread
+            memories = self.visible_memories()
+            self.scan_targets = [radio.name for radio in self.target_radios()]
+            self.scan_options = self.recall_options()
+            self.scanner.start(lambda: memories)
+            self.update_scan_hold()
 
     def stop_scan(self):
-        if self.scan_running:
-            self.scan_running = False
-            if self.scan_thread.is_alive():
-                self.scan_thread.join()
+        self.scanner.stop()
+
+    def scan_recall(self, button_info):
+        # Runs on the scan thread, the scheduler waits on the returned future
+        return self.send_freq_command(button_info['id'], self.radios_named(self.scan_targets), self.scan_options)
 
-    def scan_commands(self):
-        while self.scan_running:
-            for button_info in self.command_buttons:
-                self.send_freq_command(button_info['text'])
-                time.sleep(self.scan_wait_time)
+    def toggle_scan_hold(self):
+        self.scanner.hold_on_activity = self.scan_hold.get()
 
-                # Check if scan_running is still True; if not, break out of the loop
-                if not self.scan_running:
-                    break
+    def toggle_scan_weighted(self):
+        # Longer dwell on memories with recent decodes, quiet ones are only revisited now and then
+        self.scanner.weighted = self.scan_weighted.get()
+
+    def open_activity_window(self):
+        ActivityWindow(self.master, self.activity, self.visible_memories)
 
     def set_scan_wait_time(self):
         user_input = simpledialog.askfloat("Set Scan Wait Time", "Enter wait time between change (seconds):", initialvalue=self.scan_wait_time)
         if user_input is not None:
             self.scan_wait_time = max(0, user_input)
-
-        if self.scan_running:
-            self.stop_scan()
-            self.start_scan()
+            self.scanner.default_dwell = self.scan_wait_time
 
         print(f"Scan wait time set to {self.scan_wait_time} seconds.")
 
     def open_web_browser(self):
-        url = "http://sbitx.local:8080"
+        url = f"http://{self.radio.host}:8080"
         webbrowser.open(url)
 
     def load_button_config(self):
         try:
-            with open("sbmanager_config.json", "r") as config_file:
-                self.command_buttons = json.load(config_file)
-        except FileNotFoundError:
-            self.command_buttons = []
+            memories = self.store.load()
+            stored_ids = [memory.get('id') for memory in memories]
+            self.memory_bank.load(memories)
+        except (OSError, ValueError) as e:
+            messagebox.showerror("Error", f"Failed to load sbmanager_config.json: {e}")
+            self.memory_bank.load([])
+            return
+
+        if stored_ids != [memory['id'] for memory in self.memory_bank.memories]:
+            # Older files have no IDs (or repeat one). Write the new IDs out before any
+            # edit is journaled against them, or a reload would not find those memories
+            self.save_button_config()
 
     def save_button_config(self):
-        with open("sbmanager_config.json", "w") as config_file:
-            json.dump(self.command_buttons, config_file)
+        try:
+            self.store.save(self.memory_bank.memories)
+        except StoreConflict:
+            if messagebox.askyesno("Memories Changed", "sbmanager_config.json was changed by another program.\n\nOverwrite it with the memories shown here?"):
+                self.store.save(self.memory_bank.memories, force=True)
+            else:
+                self.load_button_config()
+                self.update_main_screen()
+        except OSError as e:
+            messagebox.showerror("Error", f"Failed to save memories: {e}")
+
+    def record_change(self, change):
+        # Journal a single edit instead of rewriting the whole bank
+        try:
+            stale = self.store.append(change, self.memory_bank.memories)
+        except OSError as e:
+            messagebox.showerror("Error", f"Failed to save memories: {e}")
+            return
+
+        if stale:
+            # The editor changed the file too, reload to merge its changes with this one
+            self.load_button_config()
+            self.update_main_screen()
+
+    def load_settings(self):
+        try:
+            with open("sbmanager_settings.json", "r") as settings_file:
+                self.settings.update(json.load(settings_file))
+        except FileNotFoundError:
+            pass
+
+    def save_settings(self):
+        with open("sbmanager_settings.json", "w") as settings_file:
+            json.dump(self.settings, settings_file, indent=2)
 
     def exit_application(self):
         confirmation = messagebox.askokcancel("Exit Application", "Are you sure you want to exit?")
         if confirmation:
-            if self.telnet_connection:
-                self.telnet_connection.close()
+            self.scanner.stop()
+            if self.api:
+                self.api.stop()
+            self.radios.stop()
+            if self.history:
+                self.history.close()
+            try:
+                self.store.compact(self.memory_bank.memories)
+            except OSError as e:
+                print(f"Error compacting memories: {e}")
             self.master.destroy()
 
 if __name__ == "__main__":
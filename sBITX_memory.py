@@ -0,0 +1,176 @@
+"""
+Memory bank with stable IDs and a frequency-sorted index.
+
+Memories stay plain dicts in the order they are stored in sbmanager_config.json,
+each carrying an integer 'id'. A sorted list of (frequency in Hz, id) pairs
+gives O(log n) nearest and range lookups through bisect.
+"""
+
+from bisect import bisect_left, bisect_right, insort
+
+from sBITX_bands import BANDS, band_for_frequency, frequency_hz
+
+# Choices offered by the frequency dialog
+MODE_OPTIONS = ["LSB", "USB", "CW", "CWR", "FT8", "PSK", "RTTY", "Digital", "2Tone"]
+AGC_OPTIONS = ["Off", "Slow", "Med", "Fast"]
+
+
+class MemoryBank:
+    def __init__(self, memories=None):
+        self.memories = []
+        self.by_id = {}
+        self.by_frequency = []
+        self.positions = None
+        self.next_id = 1
+        self.load(memories or [])
+
+    def __len__(self):
+        return len(self.memories)
+
+    def __iter__(self):
+        return iter(self.memories)
+
+    def load(self, memories):
+        self.memories = []
+        self.by_id = {}
+        self.by_frequency = []
+        self.positions = None
+
+        used = set()
+        for memory in memories:
+            if isinstance(memory.get('id'), int) and memory['id'] not in used:
+                used.add(memory['id'])
+        self.next_id = max(used, default=0) + 1
+
+        seen = set()
+        for memory in memories:
+            # Older config files have no IDs, and a hand edited file may repeat one
+            if not isinstance(memory.get('id'), int) or memory['id'] in seen:
+                memory['id'] = self.allocate_id()
+            seen.add(memory['id'])
+            self.memories.append(memory)
+            self.by_id[memory['id']] = memory
+            self._index(memory)
+
+    def allocate_id(self):
+        memory_id = self.next_id
+        self.next_id += 1
+        return memory_id
+
+    def _index(self, memory):
+        hz = frequency_hz(memory.get('text'))
+        if hz is not None:
+            insort(self.by_frequency, (hz, memory['id']))
+
+    def _unindex(self, memory):
+        hz = frequency_hz(memory.get('text'))
+        if hz is not None:
+            index = bisect_left(self.by_frequency, (hz, memory['id']))
+            if index < len(self.by_frequency) and self.by_frequency[index] == (hz, memory['id']):
+                del self.by_frequency[index]
+
+    def get(self, memory_id):
+        return self.by_id.get(memory_id)
+
+    def position(self, memory_id):
+        if self.positions is None:
+            self.positions = {memory['id']: index for index, memory in enumerate(self.memories)}
+        return self.positions[memory_id]
+
+    def add(self, memory, position=None):
+        memory['id'] = self.allocate_id()
+        if position is None:
+            self.memories.append(memory)
+            if self.positions is not None:
+                self.positions[memory['id']] = len(self.memories) - 1
+        else:
+            self.memories.insert(position, memory)
+            self.positions = None
+        self.by_id[memory['id']] = memory
+        self._index(memory)
+        return memory['id']
+
+    def extend(self, memories):
+        # Bulk append, the frequency index is sorted once instead of per memory
+        for memory in memories:
+            memory['id'] = self.allocate_id()
+            if self.positions is not None:
+                self.positions[memory['id']] = len(self.memories)
+            self.memories.append(memory)
+            self.by_id[memory['id']] = memory
+            hz = frequency_hz(memory.get('text'))
+            if hz is not None:
+                self.by_frequency.append((hz, memory['id']))
+        self.by_frequency.sort()
+        return [memory['id'] for memory in memories]
+
+    def update(self, memory_id, fields):
+        memory = self.by_id[memory_id]
+        self._unindex(memory)
+        memory.update(fields)
+        memory['id'] = memory_id
+        self._index(memory)
+        return memory
+
+    def remove(self, memory_id):
+        memory = self.by_id.pop(memory_id)
+        self._unindex(memory)
+        del self.memories[self.position(memory_id)]
+        self.positions = None
+        return memory
+
+    def move(self, memory_id, new_position):
+        memory = self.memories.pop(self.position(memory_id))
+        self.memories.insert(new_position, memory)
+        self.positions = None
+
+    def in_range(self, low_hz, high_hz):
+        # Memories between two frequencies, in frequency order
+        start = bisect_left(self.by_frequency, (low_hz, 0))
+        end = bisect_right(self.by_frequency, (high_hz, float('inf')))
+        return [self.by_id[memory_id] for _, memory_id in self.by_frequency[start:end]]
+
+    def nearest(self, frequency):
+        hz = frequency if isinstance(frequency, int) else frequency_hz(frequency)
+        if hz is None or not self.by_frequency:
+            return None
+        index = bisect_left(self.by_frequency, (hz, 0))
+        candidates = self.by_frequency[max(0, index - 1):index + 1]
+        _, memory_id = min(candidates, key=lambda item: abs(item[0] - hz))
+        return self.by_id[memory_id]
+
+    def find(self, name):
+        # By frequency text as stored, by #id, or by the same frequency written another way
+        name = str(name).strip()
+        for memory in self.memories:
+            if memory.get('text', '').strip() == name:
+                return memory
+        if name.startswith('#') and name[1:].isdigit():
+            return self.get(int(name[1:]))
+        hz = frequency_hz(name)
+        if hz is not None:
+            memory = self.nearest(hz)
+            if memory is not None and frequency_hz(memory['text']) == hz:
+                return memory
+        return None
+
+    @staticmethod
+    def matches(memory, band=None, mode=None):
+        if band and band_for_frequency(memory.get('text')) != band:
+            return False
+        if mode and memory.get('mode', '').upper() != mode.upper():
+            return False
+        return True
+
+    def filter(self, band=None, mode=None):
+        # Filtered view in stored order, a band narrows it with a range query first
+        if band:
+            edges = next(((low, high) for name, low, high in BANDS if name == band), None)
+            if edges is None:
+                return []
+            memories = sorted(self.in_range(*edges), key=lambda memory: self.position(memory['id']))
+        else:
+            memories = self.memories
+        if mode:
+            memories = [memory for memory in memories if memory.get('mode', '').upper() == mode.upper()]
+        return list(memories)
@@ -0,0 +1,186 @@
+"""
+Radio profiles and the per-radio pieces sBITX Manager keeps for each sBITX.
+
+Every radio gets its own connection (with its own event-loop thread reading
+the socket), shadow state, stats, command worker and decode parser, so radios
+never wait on each other. fan_out() hands one job to several radios at once,
+and the total time is that of the slowest radio rather than the sum.
+
+Radio.recall() and Radio.send() are the one path commands take to a radio, used
+by the GUI, the command line tool and the benchmark alike. They need no Tk.
+"""
+
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+
+from sBITX_bands import band_for_frequency, frequency_hz
+from sBITX_decode import DecodeParser
+from sBITX_executor import CommandExecutor, command_class
+from sBITX_state import RadioState
+from sBITX_stats import ConnectionStats
+
+DEFAULT_PROFILE = {"name": "sBITX", "host": "sbitx.local", "port": 8081}
+
+
+class Radio:
+    def __init__(self, profile):
+        self.name = profile["name"]
+        self.host = profile["host"]
+        self.port = int(profile.get("port", 8081))
+
+        self.connection = None
+        # CaptureWriter while the session is being recorded
+        self.capture = None
+        self.state = RadioState()
+        self.stats = ConnectionStats()
+        self.executor = CommandExecutor()
+        self.parser = DecodeParser()
+        self.current_memory_id = None
+
+    @property
+    def link_up(self):
+        return self.connection is not None and self.connection.connected
+
+    def profile(self):
+        return {"name": self.name, "host": self.host, "port": self.port}
+
+    def recall(self, memory, full=False, pipelined=True):
+        # Any thread. A newer recall replaces one that is still waiting to be sent
+        return self.executor.submit('recall', lambda: self.dispatch_recall(memory, full, pipelined),
+                                    label=f"recall {memory['text']}")
+
+    def send(self, command):
+        return self.executor.submit(command_class(command), lambda: self.dispatch_command(command), label=command)
+
+    def dispatch_recall(self, memory, full, pipelined):
+        # Planned on the executor thread so it compares against the latest state
+        connection = self.connection
+        if not connection:
+            return None
+        self.current_memory_id = memory.get('id')
+
+        frequency = memory['text']
+        self.parser.band = band_for_frequency(frequency)
+        self.parser.frequency = frequency_hz(frequency)
+
+        commands = self.state.plan_recall(memory, full=full)
+
+        started = time.monotonic()
+        future = connection.send_batch(commands, pipelined=pipelined)
+        future.add_done_callback(lambda future: self.report_batch(started, future))
+        return future
+
+    def report_batch(self, started, future):
+        if not self.link_up:
+            # Keep what was asked for, it is sent again once the connection is back
+            return
+        if future.exception() is not None:
+            # Connection trouble, the radio may be anywhere now
+            self.state.invalidate()
+            return
+
+        self.state.apply_results(future.result())
+        self.stats.record_rtt("recall", time.monotonic() - started)
+
+    def dispatch_command(self, command):
+        # Runs on the executor thread once this command reaches the front of the queue
+        connection = self.connection
+        if not connection:
+            raise ConnectionError(f"Not connected to {self.name}")
+        self.state.note_sent([command])
+        future = connection.send(command)
+        future.add_done_callback(lambda future: self.report_command(command, future))
+        return future
+
+    def report_command(self, command, future):
+        if future.cancelled():
+            return
+        if future.exception() is None:
+            # Round-trip times and timeouts are counted by the connection
+            self.state.apply_result(command, True, future.result())
+        elif self.link_up:
+            self.state.apply_result(command, False)
+
+    def stop(self):
+        if self.connection:
+            self.connection.stop()
+            self.connection = None
+        if self.capture:
+            self.capture.close()
+            self.capture = None
+        self.executor.stop()
+
+
+class RadioPool:
+    def __init__(self, profiles=()):
+        self.radios = OrderedDict()
+        for profile in profiles or [DEFAULT_PROFILE]:
+            self.add(profile)
+
+    def __iter__(self):
+        return iter(list(self.radios.values()))
+
+    def __len__(self):
+        return len(self.radios)
+
+    def names(self):
+        return list(self.radios)
+
+    def get(self, name):
+        return self.radios.get(name)
+
+    def add(self, profile):
+        if profile["name"] in self.radios:
+            raise ValueError(f"A radio named '{profile['name']}' already exists")
+        radio = self.radios[profile["name"]] = Radio(profile)
+        return radio
+
+    def remove(self, name):
+        radio = self.radios.pop(name)
+        radio.stop()
+        return radio
+
+    def profiles(self):
+        return [radio.profile() for radio in self.radios.values()]
+
+    def connected(self):
+        return [radio for radio in self.radios.values() if radio.connection is not None]
+
+    def stop(self):
+        for radio in self.radios.values():
+            radio.stop()
+
+    @staticmethod
+    def fan_out(radios, submit):
+        """
+        Call submit(radio) for every radio, each returns a future from that radio's
+        own worker. Returns one future for a {name: future} dict, done once all are.
+        """
+        futures = OrderedDict()
+        for radio in radios:
+            future = submit(radio)
+            if future is not None:
+                futures[radio.name] = future
+        return gather(futures)
+
+
+def gather(futures):
+    # A future that completes when every future in the {name: future} dict has
+    combined = Future()
+    remaining = [len(futures)]
+    lock = threading.Lock()
+
+    def done(_):
+        with lock:
+            remaining[0] -= 1
+            finished = remaining[0] == 0
+        if finished:
+            combined.set_result(futures)
+
+    if not futures:
+        combined.set_result(futures)
+    for future in list(futures.values()):
+        future.add_done_callback(done)
+    return combined
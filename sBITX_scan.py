@@ -0,0 +1,175 @@
+"""
+Memory scan scheduler driven by monotonic deadlines.
+
+Each step is given its dwell time from the moment it starts, so the time spent
+recalling the memory is part of the dwell instead of being added on top of it.
+Stopping sets an Event, which interrupts the current wait at once. A paused scan
+finishes the current dwell and then waits before recalling the next memory.
+
+In activity-weighted mode each pass is planned from an ActivityModel: memories with
+recent decodes get up to max_boost times their dwell, and memories that stayed quiet
+on their last visit are skipped until revisit_interval has passed.
+"""
+
+import threading
+import time
+
+# Seconds between checks for a stop while waiting on a recall
+POLL_INTERVAL = 0.05
+
+
+def memory_dwell(memory, default):
+    try:
+        dwell = float(memory.get('dwell') or default)
+    except (TypeError, ValueError):
+        dwell = default
+    return max(0.0, dwell)
+
+
+def scan_order(memories, priority_interval):
+    # Interleave priority memories so one is revisited after every priority_interval others
+    priority = [memory for memory in memories if memory.get('priority')]
+    normal = [memory for memory in memories if not memory.get('priority')]
+    if not priority or not normal:
+        return list(memories)
+
+    order = []
+    next_priority = 0
+    for count, memory in enumerate(normal, 1):
+        order.append(memory)
+        if count % priority_interval == 0 or count == len(normal):
+            order.append(priority[next_priority % len(priority)])
+            next_priority += 1
+    # Make sure every priority memory comes up at least once per pass
+    while next_priority < len(priority):
+        order.append(priority[next_priority])
+        next_priority += 1
+    return order
+
+
+class ScanScheduler:
+    def __init__(self, recall, default_dwell=5.0, priority_interval=3, hold_time=15.0,
+                 activity=None, lookback=900.0, max_boost=3.0, revisit_interval=300.0):
+        # recall(memory) tunes the radio and may return a future for the command batch
+        self.recall = recall
+        self.default_dwell = default_dwell
+        self.priority_interval = priority_interval
+        self.hold_on_activity = False
+        self.hold_time = hold_time
+
+        self.activity = activity
+        self.weighted = False
+        self.lookback = lookback
+        self.max_boost = max_boost
+        self.revisit_interval = revisit_interval
+        self.visited = {}
+
+        self.stop_event = threading.Event()
+        self.resumed = threading.Event()
+        self.resumed.set()
+        self.thread = None
+        self.last_activity = 0.0
+        self.current = None
+
+    @property
+    def running(self):
+        return self.thread is not None and self.thread.is_alive()
+
+    def start(self, get_memories):
+        if self.running:
+            return
+        self.stop_event.clear()
+        self.thread = threading.Thread(target=self.run, args=(get_memories,), name="sbitx-scan", daemon=True)
+        self.thread.start()
+
+    def pause(self):
+        self.resumed.clear()
+
+    def resume(self):
+        self.resumed.set()
+
+    def stop(self, timeout=1.0):
+        # Every wait in the scan thread also watches stop_event, so it ends within one poll.
+        # The join is bounded anyway since this is called from the Tk thread
+        self.stop_event.set()
+        self.resumed.set()
+        if self.thread is not None and self.thread is not threading.current_thread():
+            self.thread.join(timeout)
+        if self.thread is not None and not self.thread.is_alive():
+            self.thread = None
+        self.current = None
+
+    def note_activity(self):
+        # Called whenever decodes arrive, drives the hold while decoding mode
+        self.last_activity = time.monotonic()
+
+    def run(self, get_memories):
+        deadline = time.monotonic()
+        while not self.stop_event.is_set():
+            order = scan_order(get_memories(), self.priority_interval)
+            if not order:
+                break
+
+            for memory, dwell in self.plan_pass(order):
+                if not self.resumed.is_set():
+                    self.resumed.wait()
+                    if self.stop_event.is_set():
+                        return
+                    # Give the memory its whole dwell after a pause
+                    deadline = time.monotonic()
+
+                # Start on the previous deadline so timing does not drift, unless we fell behind
+                start = max(deadline, time.monotonic())
+                deadline = start + dwell
+                if not self.step(memory, deadline):
+                    return
+
+    def plan_pass(self, order):
+        # (memory, dwell) pairs for one pass over order
+        if not self.weighted or self.activity is None:
+            return [(memory, memory_dwell(memory, self.default_dwell)) for memory in order]
+
+        now = time.monotonic()
+        counts = [self.activity.memory_count(memory.get('id'), self.lookback) for memory in order]
+        busiest = max(counts)
+        plan = []
+        for memory, count in zip(order, counts):
+            dwell = memory_dwell(memory, self.default_dwell)
+            if count:
+                dwell *= 1 + (self.max_boost - 1) * count / busiest
+            elif not memory.get('priority') and now - self.visited.get(memory.get('id'), -self.revisit_interval) < self.revisit_interval:
+                # Heard nothing last time, come back to it later
+                continue
+            plan.append((memory, dwell))
+
+        if not plan:
+            # Everything is quiet, fall back to a plain pass
+            return [(memory, memory_dwell(memory, self.default_dwell)) for memory in order]
+        return plan
+
+    def step(self, memory, deadline):
+        self.current = memory
+        self.visited[memory.get('id')] = time.monotonic()
+        self.last_activity = 0.0
+
+        future = self.recall(memory)
+        if future is not None:
+            # Wait for the recall to go out, but not past the dwell or a stop
+            while not future.done():
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                if self.stop_event.wait(min(remaining, POLL_INTERVAL)):
+                    return False
+
+        while True:
+            if self.stop_event.wait(max(0.0, deadline - time.monotonic())):
+                return False
+            if not self.hold_on_activity:
+                return True
+
+            # Stay on this memory while decodes keep arriving
+            hold_until = self.last_activity + self.hold_time
+            if hold_until <= time.monotonic():
+                return True
+            deadline = hold_until
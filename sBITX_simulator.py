@@ -0,0 +1,173 @@
+#!/usr/bin/env python3
+
+"""
+Local stand-in for the sBITX telnet server, for trying out and benchmarking
+sBITX Manager without a transceiver on the network.
+
+It answers the f, m, bw, if, agc, vfo, step and clear commands (and the other
+commands the manager menus send) after a configurable delay and jitter, ends
+every reply with the '>' prompt and can inject a synthetic FT8 and CW decode stream.
+
+Example:
+    ./sBITX_simulator.py --port 8081 --delay 20 --jitter 10 --ft8-rate 5
+"""
+
+import argparse
+import asyncio
+import random
+import threading
+import time
+
+CALL_PREFIXES = ["K", "W", "N", "AA", "KD", "VE", "G", "DL", "F", "JA", "VK", "PY", "EA", "I", "OH"]
+GRIDS = ["FN42", "FN31", "EM73", "DM79", "CN87", "IO91", "JO62", "JN45", "PM95", "QF56", "GG87", "IM98", "KP20"]
+
+# Reply word for each setting, matching what RadioState parses
+SETTING_NAMES = {'f': 'freq', 'm': 'mode', 'bw': 'bw', 'if': 'if', 'agc': 'agc', 'vfo': 'vfo', 'step': 'step'}
+OTHER_COMMANDS = {'rit', 'split', 'span', 'drive', 'audio', 'comp'}
+
+
+def random_call(rng):
+    return f"{rng.choice(CALL_PREFIXES)}{rng.randint(0, 9)}{''.join(rng.choice('ABCDEFGHIJKLMNOPQRSTUVWXYZ') for _ in range(rng.randint(1, 3)))}"
+
+
+def ft8_line(rng):
+    utc = time.strftime("%H%M%S", time.gmtime())
+    kind = rng.random()
+    if kind < 0.4:
+        message = f"CQ {random_call(rng)} {rng.choice(GRIDS)}"
+    elif kind < 0.7:
+        message = f"{random_call(rng)} {random_call(rng)} {rng.randint(-24, 10):+03d}"
+    elif kind < 0.85:
+        message = f"{random_call(rng)} {random_call(rng)} {rng.choice(GRIDS)}"
+    else:
+        message = f"{random_call(rng)} {random_call(rng)} {rng.choice(['RR73', 'RRR', '73'])}"
+    return f"{{{utc} {rng.randint(-24, 15):3d} {rng.uniform(-0.5, 1.5):+.1f} {rng.randint(200, 2800):4d} ~ {message}}}\r\n"
+
+
+def cw_line(rng):
+    return f"{{CQ CQ DE {random_call(rng)} {random_call(rng)} K}}\r\n"
+
+
+class SimulatedRadio:
+    def __init__(self, delay=0.0, jitter=0.0, command_delays=None, ft8_rate=0.0, cw_rate=0.0, seed=None):
+        # Delays are in seconds
+        self.delay = delay
+        self.jitter = jitter
+        self.command_delays = command_delays or {}
+        self.ft8_rate = ft8_rate
+        self.cw_rate = cw_rate
+        self.rng = random.Random(seed)
+        self.settings = {'f': '7074000', 'm': 'USB', 'bw': '3000', 'if': '50', 'agc': 'Off', 'vfo': 'a', 'step': '1k'}
+        self.commands_received = 0
+        self.decodes_sent = 0
+
+    async def handle_client(self, reader, writer):
+        decoder = asyncio.ensure_future(self.inject_decodes(writer))
+        try:
+            writer.write(b"sBITX telnet\r\n>")
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                command = line.decode('ascii', 'replace').strip()
+                reply = self.execute(command)
+
+                delay = self.command_delays.get(command.split(' ', 1)[0].lower(), self.delay)
+                if delay or self.jitter:
+                    await asyncio.sleep(max(0.0, delay + self.rng.uniform(-self.jitter, self.jitter)))
+
+                writer.write(reply.encode('ascii') + b"\r\n>")
+                await writer.drain()
+        except (ConnectionError, OSError):
+            pass
+        finally:
+            decoder.cancel()
+            writer.close()
+
+    def execute(self, command):
+        self.commands_received += 1
+        parts = command.split(None, 1)
+        if not parts:
+            return ""
+        word = parts[0].lower()
+        value = parts[1] if len(parts) > 1 else ""
+
+        if word == 'clear':
+            return "cleared"
+        if word in SETTING_NAMES and value:
+            self.settings[word] = value
+            return f"{SETTING_NAMES[word]} {value}"
+        if word in OTHER_COMMANDS and value:
+            return f"{word} {value}"
+        return f"Unknown command '{command}'"
+
+    async def inject_decodes(self, writer):
+        rate = self.ft8_rate + self.cw_rate
+        if rate <= 0:
+            return
+        while True:
+            await asyncio.sleep(self.rng.expovariate(rate))
+            if self.rng.random() * rate < self.ft8_rate:
+                line = ft8_line(self.rng)
+            else:
+                line = cw_line(self.rng)
+            writer.write(line.encode('ascii'))
+            self.decodes_sent += 1
+
+
+def start_in_thread(radio, host="127.0.0.1", port=0):
+    # Runs the simulator on its own event-loop thread, returns the bound port and the loop
+    loop = asyncio.new_event_loop()
+    started = threading.Event()
+    bound = {}
+
+    def run():
+        asyncio.set_event_loop(loop)
+        server = loop.run_until_complete(asyncio.start_server(radio.handle_client, host, port))
+        bound['port'] = server.sockets[0].getsockname()[1]
+        started.set()
+        loop.run_forever()
+
+    threading.Thread(target=run, name="sbitx-simulator", daemon=True).start()
+    started.wait()
+    return bound['port'], loop
+
+
+def parse_command_delays(values):
+    delays = {}
+    for value in values or []:
+        name, _, milliseconds = value.partition('=')
+        delays[name.strip().lower()] = float(milliseconds) / 1000
+    return delays
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Simulated sBITX telnet server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8081)
+    parser.add_argument("--delay", type=float, default=0.0, help="reply delay per command in ms")
+    parser.add_argument("--jitter", type=float, default=0.0, help="random +/- jitter added to the delay in ms")
+    parser.add_argument("--command-delay", action="append", metavar="CMD=MS",
+                        help="delay for one command, e.g. clear=50 (repeatable)")
+    parser.add_argument("--ft8-rate", type=float, default=0.0, help="FT8 decode lines per second")
+    parser.add_argument("--cw-rate", type=float, default=0.0, help="CW decode lines per second")
+    args = parser.parse_args()
+
+    radio = SimulatedRadio(delay=args.delay / 1000, jitter=args.jitter / 1000,
+                           command_delays=parse_command_delays(args.command_delay),
+                           ft8_rate=args.ft8_rate, cw_rate=args.cw_rate)
+
+    async def serve():
+        server = await asyncio.start_server(radio.handle_client, args.host, args.port)
+        print(f"Simulated sBITX listening on {args.host}:{args.port}")
+        async with server:
+            await server.serve_forever()
+
+    try:
+        asyncio.run(serve())
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
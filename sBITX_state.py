@@ -0,0 +1,128 @@
+"""
+Shadow model of the sBITX settings, kept up to date from the commands the
+manager sends and the replies it reads back.
+
+Recalls are planned against it so only the settings that differ from what the
+radio is already set to are sent.
+"""
+
+import re
+import threading
+
+from sBITX_bands import frequency_hz
+
+# Command word for each setting a memory recall touches, in the order they are sent
+RECALL_FIELDS = [
+    ('f', 'text'),
+    ('m', 'mode'),
+    ('bw', 'bandwidth'),
+    ('if', 'if_setting'),
+    ('agc', 'agc_setting'),
+]
+
+# Other settings worth remembering so they can be restored after a reconnect
+TRACKED_COMMANDS = {'f', 'm', 'bw', 'if', 'agc', 'vfo', 'step', 'rit', 'split', 'span', 'drive', 'audio', 'comp'}
+
+REPLY_FIELDS = {
+    'freq': 'f', 'frequency': 'f', 'f': 'f',
+    'mode': 'm', 'm': 'm',
+    'bw': 'bw', 'bandwidth': 'bw',
+    'if': 'if', 'agc': 'agc',
+}
+REPLY_LINE = re.compile(r"^\s*([A-Za-z]+)\s*[:=]?\s*(\S+)\s*$")
+
+
+def parse_command(command):
+    parts = command.strip().split(None, 1)
+    if len(parts) != 2 or parts[0].lower() not in TRACKED_COMMANDS:
+        return None
+    return parts[0].lower(), parts[1].strip()
+
+
+def normalise(field, value):
+    if field == 'f':
+        return frequency_hz(value)
+    return str(value).strip().lower()
+
+
+class RadioState:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.values = {}
+
+    def get(self, field):
+        with self.lock:
+            return self.values.get(field)
+
+    def snapshot(self):
+        with self.lock:
+            return dict(self.values)
+
+    def invalidate(self):
+        # Forget everything, the next recall sends every setting
+        with self.lock:
+            self.values.clear()
+
+    def note_sent(self, commands):
+        # Record settings as soon as they are queued, so a recall planned while
+        # another is still in flight compares against where the radio is heading
+        with self.lock:
+            for command in commands:
+                parsed = parse_command(command)
+                if parsed and parsed[0] == 'vfo' and parsed[1] != self.values.get('vfo'):
+                    # The other VFO has its own frequency, mode and filter
+                    for field, _ in RECALL_FIELDS:
+                        self.values.pop(field, None)
+                if parsed:
+                    self.values[parsed[0]] = parsed[1]
+
+    def apply_result(self, command, ok, reply=''):
+        parsed = parse_command(command)
+        with self.lock:
+            if parsed and not ok:
+                # The radio may or may not have applied it
+                self.values.pop(parsed[0], None)
+            if ok and reply:
+                self._apply_reply(reply)
+
+    def apply_results(self, results):
+        for command, ok, reply in results:
+            self.apply_result(command, ok, reply)
+
+    def _apply_reply(self, reply):
+        for line in reply.replace('>', '\n').splitlines():
+            match = REPLY_LINE.match(line)
+            if match and match.group(1).lower() in REPLY_FIELDS:
+                self.values[REPLY_FIELDS[match.group(1).lower()]] = match.group(2)
+
+    def plan_recall(self, memory, full=False):
+        """
+        Commands needed to bring the radio to a memory. With full=False the
+        settings the radio already has are skipped. 'clear' follows every
+        frequency change so the radio's decode console starts fresh.
+        """
+        commands = []
+        with self.lock:
+            for field, key in RECALL_FIELDS:
+                value = str(memory.get(key, '')).strip()
+                if not value:
+                    continue
+                known = self.values.get(field)
+                if full or known is None or normalise(field, known) != normalise(field, value):
+                    commands.append(f'{field} {value}')
+                    self.values[field] = value
+
+        if full or (commands and commands[0].startswith('f ')):
+            commands.append('clear')
+        return commands
+
+    def replay_commands(self):
+        # Everything known, for restoring the radio after it restarted. The VFO goes
+        # first, the frequency, mode and filter belong to the VFO that was selected
+        with self.lock:
+            values = dict(self.values)
+        commands = [f'vfo {values["vfo"]}'] if 'vfo' in values else []
+        commands += [f'{field} {values[field]}' for field, _ in RECALL_FIELDS if field in values]
+        commands += [f'{field} {value}' for field, value in values.items()
+                     if field not in dict(RECALL_FIELDS) and field != 'vfo']
+        return commands
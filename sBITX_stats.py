@@ -0,0 +1,168 @@
+"""
+Round-trip latency instrumentation for the sBITX connection.
+
+Latencies go into fixed-size log-linear histograms in the style of HdrHistogram:
+32 linear sub-buckets per power of two of microseconds, so percentiles are
+accurate to about 3% and memory use does not grow with the number of samples.
+"""
+
+import csv
+import json
+import threading
+import time
+from array import array
+
+SUB_BUCKET_BITS = 5
+SUB_BUCKETS = 1 << SUB_BUCKET_BITS
+MAX_EXPONENT = 27  # About 134 seconds in microseconds
+
+
+class LatencyHistogram:
+    def __init__(self):
+        self.counts = array('Q', [0]) * (SUB_BUCKETS + (MAX_EXPONENT - SUB_BUCKET_BITS + 1) * SUB_BUCKETS)
+        self.total = 0
+        self.sum = 0
+        self.min = None
+        self.max = 0
+
+    def bucket(self, micros):
+        if micros < SUB_BUCKETS:
+            return micros
+        exponent = min(micros.bit_length() - 1, MAX_EXPONENT)
+        shift = exponent - SUB_BUCKET_BITS
+        sub = min((micros >> shift) - SUB_BUCKETS, SUB_BUCKETS - 1)
+        return SUB_BUCKETS + shift * SUB_BUCKETS + sub
+
+    def bucket_value(self, index):
+        # Midpoint of the bucket in microseconds
+        if index < SUB_BUCKETS:
+            return index
+        shift, sub = divmod(index - SUB_BUCKETS, SUB_BUCKETS)
+        low = (SUB_BUCKETS + sub) << shift
+        return low + ((1 << shift) >> 1)
+
+    def record(self, seconds):
+        micros = max(0, int(seconds * 1000000))
+        self.counts[self.bucket(micros)] += 1
+        self.total += 1
+        self.sum += micros
+        self.min = micros if self.min is None else min(self.min, micros)
+        self.max = max(self.max, micros)
+
+    def percentile(self, fraction):
+        # In milliseconds
+        if not self.total:
+            return 0.0
+        target = max(1, int(round(fraction * self.total)))
+        seen = 0
+        for index, count in enumerate(self.counts):
+            seen += count
+            if seen >= target:
+                return min(self.bucket_value(index), self.max) / 1000
+        return self.max / 1000
+
+    def mean(self):
+        return self.sum / self.total / 1000 if self.total else 0.0
+
+
+class ConnectionStats:
+    RATE_WINDOW = 60  # Seconds of decode line counts kept for the rate
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self.lock:
+            self.histograms = {}
+            self.timeouts = {}
+            self.reconnects = 0
+            self.decode_lines = 0
+            self.decode_buckets = array('Q', [0]) * self.RATE_WINDOW
+            self.decode_seconds = array('q', [-1]) * self.RATE_WINDOW
+            self.started = time.time()
+
+    def record_rtt(self, command, seconds):
+        word = command_word(command)
+        with self.lock:
+            histogram = self.histograms.get(word)
+            if histogram is None:
+                histogram = self.histograms[word] = LatencyHistogram()
+            histogram.record(seconds)
+
+    def record_timeout(self, command):
+        word = command_word(command)
+        with self.lock:
+            self.timeouts[word] = self.timeouts.get(word, 0) + 1
+
+    def record_reconnect(self):
+        # Only links brought back by the supervisor, opening and closing by hand is not counted
+        with self.lock:
+            self.reconnects += 1
+
+    def record_decodes(self, lines, now=None):
+        second = int(now if now is not None else time.time())
+        slot = second % self.RATE_WINDOW
+        with self.lock:
+            self.decode_lines += lines
+            if self.decode_seconds[slot] != second:
+                self.decode_seconds[slot] = second
+                self.decode_buckets[slot] = 0
+            self.decode_buckets[slot] += lines
+
+    def decode_rate(self, window=10, now=None):
+        # Lines per second over the last complete window seconds
+        current = int(now if now is not None else time.time())
+        with self.lock:
+            total = 0
+            for second in range(current - window, current):
+                slot = second % self.RATE_WINDOW
+                if self.decode_seconds[slot] == second:
+                    total += self.decode_buckets[slot]
+        return total / window
+
+    def snapshot(self):
+        rate = self.decode_rate()
+        with self.lock:
+            commands = {}
+            for word in sorted(set(self.histograms) | set(self.timeouts)):
+                histogram = self.histograms.get(word) or LatencyHistogram()
+                commands[word] = {
+                    'count': histogram.total,
+                    'mean_ms': round(histogram.mean(), 3),
+                    'p50_ms': round(histogram.percentile(0.50), 3),
+                    'p95_ms': round(histogram.percentile(0.95), 3),
+                    'p99_ms': round(histogram.percentile(0.99), 3),
+                    'max_ms': round(histogram.max / 1000, 3),
+                    'timeouts': self.timeouts.get(word, 0),
+                }
+            return {
+                'since': self.started,
+                'reconnects': self.reconnects,
+                'decode_lines': self.decode_lines,
+                'decode_lines_per_second': rate,
+                'commands': commands,
+            }
+
+    def export_json(self, path):
+        with open(path, "w") as export_file:
+            json.dump(self.snapshot(), export_file, indent=2)
+
+    def export_csv(self, path):
+        snapshot = self.snapshot()
+        fields = ['command', 'count', 'mean_ms', 'p50_ms', 'p95_ms', 'p99_ms', 'max_ms', 'timeouts']
+        with open(path, "w", newline="") as export_file:
+            writer = csv.writer(export_file)
+            writer.writerow(fields)
+            for word, row in snapshot['commands'].items():
+                writer.writerow([word] + [row[field] for field in fields[1:]])
+            writer.writerow([])
+            writer.writerow(['reconnects', snapshot['reconnects']])
+            writer.writerow(['decode_lines', snapshot['decode_lines']])
+            writer.writerow(['decode_lines_per_second', snapshot['decode_lines_per_second']])
+
+
+def command_word(command):
+    # Histograms are kept per command type, "f 7074" and "f 14074" share one
+    parts = command.strip().split(None, 1)
+    return parts[0].lower() if parts else 'banner'
@@ -0,0 +1,157 @@
+"""
+Memory bank storage shared by sBITX Manager and sBITX Editor.
+
+sbmanager_config.json keeps its original format, a JSON list of memories, and
+is only ever replaced atomically through a temp file and rename. Single edits are
+appended to a change journal next to it and folded back into the JSON file once
+the journal grows. Every journal operation is idempotent, so replaying a journal
+over a file that already contains its changes is harmless.
+
+Both files are checked for changes by the other program before writing, so the
+manager and the editor do not silently overwrite each other.
+"""
+
+import json
+import os
+import tempfile
+
+
+class StoreConflict(Exception):
+    pass
+
+
+def apply_change(memories, change):
+    op = change['op']
+
+    if op == 'replace':
+        return list(change['memories'])
+
+    if op == 'order':
+        # Memories not named in the order keep their relative order at the end
+        by_id = {memory.get('id'): memory for memory in memories}
+        ordered = [by_id.pop(memory_id) for memory_id in change['ids'] if memory_id in by_id]
+        return ordered + [memory for memory in memories if memory.get('id') in by_id]
+
+    ids = [memory.get('id') for memory in memories]
+
+    if op == 'add' or op == 'update':
+        memory = change['memory']
+        if memory['id'] in ids:
+            memories[ids.index(memory['id'])] = memory
+        elif change.get('position') is not None:
+            memories.insert(change['position'], memory)
+        else:
+            memories.append(memory)
+    elif op == 'remove':
+        if change['id'] in ids:
+            del memories[ids.index(change['id'])]
+    elif op == 'move':
+        if change['id'] in ids:
+            memory = memories.pop(ids.index(change['id']))
+            memories.insert(change['position'], memory)
+    else:
+        raise ValueError(f"Unknown journal operation '{op}'")
+    return memories
+
+
+class MemoryStore:
+    def __init__(self, path="sbmanager_config.json", compact_after=200):
+        self.path = path
+        self.journal_path = os.path.splitext(path)[0] + ".journal"
+        self.compact_after = compact_after
+        self.journal_entries = 0
+        self.version = None
+
+    def disk_version(self):
+        version = []
+        for path in (self.path, self.journal_path):
+            try:
+                stat = os.stat(path)
+                version.append((stat.st_mtime_ns, stat.st_size))
+            except FileNotFoundError:
+                version.append(None)
+        return tuple(version)
+
+    def is_stale(self):
+        return self.version is not None and self.disk_version() != self.version
+
+    def load(self):
+        try:
+            with open(self.path, "r") as config_file:
+                memories = json.load(config_file)
+        except FileNotFoundError:
+            memories = []
+
+        self.journal_entries = 0
+        try:
+            with open(self.journal_path, "rb+") as journal_file:
+                offset = 0
+                for line in journal_file:
+                    try:
+                        change = json.loads(line)
+                    except ValueError:
+                        # A torn last line from a crash mid-append, cut it off so later appends stay readable
+                        journal_file.truncate(offset)
+                        break
+                    memories = apply_change(memories, change)
+                    self.journal_entries += 1
+                    offset += len(line)
+        except FileNotFoundError:
+            pass
+
+        self.version = self.disk_version()
+        return memories
+
+    def append(self, change, memories=None):
+        """
+        Journal one change. Returns True if the files had been changed by another
+        program since they were last read, the caller should then load() again to
+        pick up those changes, which now include this one.
+        """
+        stale = self.is_stale()
+
+        with open(self.journal_path, "a") as journal_file:
+            journal_file.write(json.dumps(change) + "\n")
+            journal_file.flush()
+            os.fsync(journal_file.fileno())
+        self.journal_entries += 1
+
+        if stale:
+            self.version = None
+            return True
+
+        self.version = self.disk_version()
+        if memories is not None and self.journal_entries >= self.compact_after:
+            self.save(memories)
+        return False
+
+    def save(self, memories, force=False):
+        # Write the full bank atomically and start a new journal
+        if not force and self.is_stale():
+            raise StoreConflict(f"{self.path} was changed by another program")
+
+        directory = os.path.dirname(os.path.abspath(self.path))
+        fd, temp_path = tempfile.mkstemp(prefix=".sbmanager_config.", suffix=".tmp", dir=directory)
+        try:
+            with os.fdopen(fd, "w") as temp_file:
+                json.dump(memories, temp_file)
+                temp_file.flush()
+                os.fsync(temp_file.fileno())
+            os.replace(temp_path, self.path)
+        except BaseException:
+            try:
+                os.remove(temp_path)
+            except OSError:
+                pass
+            raise
+
+        try:
+            os.remove(self.journal_path)
+        except FileNotFoundError:
+            pass
+        self.journal_entries = 0
+        self.version = self.disk_version()
+
+    def compact(self, memories):
+        if self.journal_entries and not self.is_stale():
+            self.save(memories)
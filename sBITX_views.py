@@ -0,0 +1,136 @@
+"""
+Listbox view of memories that applies row diffs instead of full rebuilds.
+"""
+
+import tkinter as tk
+
+
+class MemoryListView:
+    """
+    Keeps a tk.Listbox in step with a list of memory IDs.
+
+    Single edits touch only their own row. A filter predicate decides which
+    memories are shown, and rows stay in the order given by the key function.
+    Large rebuilds are inserted in chunks from after() so the UI stays responsive.
+    """
+
+    CHUNK_SIZE = 500
+
+    def __init__(self, listbox, format_row, key=None, match=None):
+        self.listbox = listbox
+        self.format_row = format_row
+        self.key = key
+        self.match = match
+        self.row_ids = []
+        self.pending = []
+        self.load_job = None
+
+    def memory_id(self, row):
+        self.finish()
+        if 0 <= row < len(self.row_ids):
+            return self.row_ids[row]
+        return None
+
+    def row_of(self, memory_id):
+        self.finish()
+        try:
+            return self.row_ids.index(memory_id)
+        except ValueError:
+            return None
+
+    def set_rows(self, memories):
+        # Full rebuild, only used when the filter changes or the bank is reloaded
+        self.cancel_load()
+        self.listbox.delete(0, tk.END)
+        self.row_ids = []
+        self.pending = list(memories)
+        self.load_chunk()
+
+    def load_chunk(self):
+        self.load_job = None
+        chunk = self.pending[:self.CHUNK_SIZE]
+        del self.pending[:self.CHUNK_SIZE]
+        if chunk:
+            self.listbox.insert(tk.END, *[self.format_row(memory) for memory in chunk])
+            self.row_ids.extend(memory['id'] for memory in chunk)
+        if self.pending:
+            self.load_job = self.listbox.after(1, self.load_chunk)
+
+    def cancel_load(self):
+        if self.load_job is not None:
+            self.listbox.after_cancel(self.load_job)
+            self.load_job = None
+        self.pending = []
+
+    def finish(self):
+        # Complete a chunked rebuild before applying a diff on top of it
+        if self.load_job is not None:
+            self.listbox.after_cancel(self.load_job)
+            self.load_job = None
+        if self.pending:
+            self.listbox.insert(tk.END, *[self.format_row(memory) for memory in self.pending])
+            self.row_ids.extend(memory['id'] for memory in self.pending)
+            self.pending = []
+
+    def insertion_row(self, memory):
+        if self.key is None:
+            return len(self.row_ids)
+        target = self.key(memory['id'])
+        low, high = 0, len(self.row_ids)
+        while low < high:
+            mid = (low + high) // 2
+            if self.key(self.row_ids[mid]) < target:
+                low = mid + 1
+            else:
+                high = mid
+        return low
+
+    def insert(self, memory):
+        self.finish()
+        if self.match is not None and not self.match(memory):
+            return None
+        row = self.insertion_row(memory)
+        self.listbox.insert(row, self.format_row(memory))
+        self.row_ids.insert(row, memory['id'])
+        return row
+
+    def delete(self, memory_id):
+        row = self.row_of(memory_id)
+        if row is not None:
+            self.listbox.delete(row)
+            del self.row_ids[row]
+        return row
+
+    def replace(self, memory):
+        row = self.row_of(memory['id'])
+        if row is None:
+            # An edit can bring a memory into the filtered view
+            return self.insert(memory)
+        if self.match is not None and not self.match(memory):
+            return self.delete(memory['id'])
+
+        selected = row in self.listbox.curselection()
+        self.listbox.delete(row)
+        self.listbox.insert(row, self.format_row(memory))
+        if selected:
+            self.listbox.selection_set(row)
+        return row
+
+    def move(self, row, new_row):
+        self.finish()
+        text = self.listbox.get(row)
+        selected = row in self.listbox.curselection()
+        self.listbox.delete(row)
+        self.listbox.insert(new_row, text)
+        self.row_ids.insert(new_row, self.row_ids.pop(row))
+        if selected:
+            self.listbox.selection_set(new_row)
+            self.listbox.see(new_row)
+
+    def select(self, memory_id):
+        row = self.row_of(memory_id)
+        if row is not None:
+            self.listbox.selection_clear(0, tk.END)
+            self.listbox.selection_set(row)
+            self.listbox.see(row)
+        return row
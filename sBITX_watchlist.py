@@ -0,0 +1,172 @@
+"""
+Watchlist of callsigns, callsign prefixes, grid squares and regular expressions,
+matched against the decode stream.
+
+A line is scanned once however long the list is. Callsigns, prefixes and grids
+are looked up per token in hash tables keyed by the entry value, so hundreds of
+them cost no more than a few. Regex entries are compiled into one alternation,
+each wrapped in its own capturing group. The outermost group of the branch that
+matched closes last, so match.lastindex points straight back at the entry even
+when a user pattern has groups of its own.
+"""
+
+import re
+
+from sBITX_decode import CALLSIGN, GRID
+
+KINDS = ["call", "prefix", "grid", "regex"]
+
+TOKEN = re.compile(r"[A-Z0-9/]+")
+
+# FT8 sign-offs, "RR73" would otherwise match a watched grid or prefix such as "RR"
+SIGN_OFFS = frozenset(("RR73", "RRR", "73"))
+
+
+class WatchEntry:
+    __slots__ = ("kind", "value")
+
+    def __init__(self, kind, value):
+        self.kind = kind
+        self.value = value
+
+    def __str__(self):
+        return f"{self.kind} {self.value}"
+
+
+def parse_entry(line):
+    """
+    Parse one watchlist line, "call K1ABC", "prefix VK9", "grid FN42" or "regex <pattern>".
+    A bare callsign or grid is accepted without the kind. Raises ValueError.
+    """
+    kind, _, value = line.strip().partition(" ")
+    kind = kind.lower()
+    if kind not in KINDS:
+        value = line.strip()
+        token = value.upper()
+        if GRID.match(token):
+            kind = "grid"
+        elif CALLSIGN.match(token):
+            kind = "call"
+        else:
+            raise ValueError(f"'{line.strip()}' needs a kind, one of {', '.join(KINDS)}")
+    value = value.strip()
+    if not value:
+        raise ValueError(f"'{line.strip()}' has no value")
+
+    if kind == "regex":
+        try:
+            compiled = re.compile(value)
+        except re.error as e:
+            raise ValueError(f"bad pattern '{value}': {e}") from None
+        if compiled.search("") is not None:
+            raise ValueError(f"pattern '{value}' matches empty text")
+        # It has to work as one branch among others, so no named groups, backreferences or global flags
+        if compiled.groupindex or re.search(r"\\[1-9]", value):
+            raise ValueError(f"pattern '{value}' uses group references")
+        try:
+            re.compile(f"(x)|({value})")
+        except re.error as e:
+            raise ValueError(f"bad pattern '{value}': {e}") from None
+    else:
+        value = value.upper()
+        if not re.fullmatch(r"[A-Z0-9]+", value):
+            raise ValueError(f"bad {kind} '{value}'")
+        if kind == "grid" and not re.fullmatch(r"[A-R]{1,2}|[A-R]{2}[0-9]{1,2}|[A-R]{2}[0-9]{2}[A-X]{2}", value):
+            raise ValueError(f"bad grid '{value}'")
+    return WatchEntry(kind, value)
+
+
+def parse_entries(text):
+    # One entry per line, blank lines and lines starting with # are skipped
+    entries = []
+    errors = []
+    for number, line in enumerate(text.splitlines(), 1):
+        if not line.strip() or line.lstrip().startswith("#"):
+            continue
+        try:
+            entries.append(parse_entry(line))
+        except ValueError as e:
+            errors.append(f"line {number}: {e}")
+    return entries, errors
+
+
+class Watchlist:
+    def __init__(self, entries=()):
+        self.entries = []
+        self.set_entries(entries)
+
+    def __len__(self):
+        return len(self.entries)
+
+    def set_entries(self, entries):
+        self.entries = list(entries)
+        self.calls = {}
+        self.prefixes = {}
+        self.grids = {}
+        parts = []
+        self.groups = {}
+        group = 1
+        for entry in self.entries:
+            if entry.kind == "regex":
+                parts.append(f"({entry.value})")
+                self.groups[group] = entry
+                # Skip over the groups inside the user pattern
+                group += 1 + re.compile(entry.value).groups
+            else:
+                table = {"call": self.calls, "prefix": self.prefixes, "grid": self.grids}[entry.kind]
+                table.setdefault(entry.value, entry)
+
+        # Longest first, so VK9X wins over VK
+        self.prefix_lengths = sorted({len(value) for value in self.prefixes}, reverse=True)
+        self.grid_lengths = sorted({len(value) for value in self.grids}, reverse=True)
+        self.matcher = re.compile("|".join(parts), re.IGNORECASE) if parts else None
+
+    @property
+    def active(self):
+        return bool(self.entries)
+
+    def lines(self):
+        return [str(entry) for entry in self.entries]
+
+    def match_token(self, token):
+        if token in SIGN_OFFS:
+            return None
+        if GRID.match(token):
+            # A six character grid such as FN42AB also looks like a callsign
+            for length in self.grid_lengths:
+                entry = self.grids.get(token[:length])
+                if entry is not None:
+                    return entry
+            return None
+        if not CALLSIGN.match(token):
+            # Times, reports, offsets and free text never match a call or prefix
+            return None
+        # Portable calls such as VE3/K1ABC and K1ABC/P are checked part by part
+        parts = token.split("/") if "/" in token else (token,)
+        for part in parts:
+            entry = self.calls.get(part)
+            if entry is not None:
+                return entry
+        if self.prefixes:
+            for part in parts:
+                if part.isalpha():
+                    continue
+                for length in self.prefix_lengths:
+                    entry = self.prefixes.get(part[:length])
+                    if entry is not None:
+                        return entry
+        return None
+
+    def scan(self, text):
+        # (entry, matched text) for every hit in text, in order
+        hits = []
+        if self.calls or self.prefixes or self.grids:
+            for match in TOKEN.finditer(text.upper()):
+                entry = self.match_token(match.group())
+                if entry is not None:
+                    hits.append((match.start(), entry, match.group()))
+        if self.matcher is not None:
+            for match in self.matcher.finditer(text):
+                hits.append((match.start(), self.groups[match.lastindex], match.group()))
+            hits.sort(key=lambda hit: hit[0])
+        return [(entry, matched) for _, entry, matched in hits]
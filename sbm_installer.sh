@@ -20,7 +20,10 @@ fi
 cd "$working_directory"
 
 # Give execute permissions
-chmod +x ./sBITX_manager.py ./sBITX_editor.py ./sbm_installer.sh ./sbm_uninstaller.sh
+chmod +x ./sBITX_manager.py ./sBITX_editor.py ./sBITX_cli.py ./sbm_installer.sh ./sbm_uninstaller.sh
+
+# Command line version, for scripts and SSH sessions
+sudo ln -sf "$working_directory/sBITX_cli.py" /usr/local/bin/sbitx-manager
 
 # Create a desktop shortcut for sBITX_manager
 echo -e "[Desktop Entry]\nName=sBITX Manager\nExec=sh -c 'cd $working_directory && ./sBITX_manager.py'\nType=Application\n" | sudo tee /usr/share/applications/sBITX_manager.desktop > /dev/null
@@ -8,6 +8,9 @@ sudo rm -rf /home/pi/sBITX-Manager
 sudo rm /usr/share/applications/sBITX_manager.*
 sudo rm /usr/share/applications/sBITX_editor.*
 
+# Remove the command line link
+sudo rm -f /usr/local/bin/sbitx-manager
+
 # Update the menu cache
 sudo update-desktop-database
 